@@ -0,0 +1,49 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import responses
+from api.serializers import QuestionBatchSerializer
+from questions.models import Question
+
+
+class Command(BaseCommand):
+    """
+    Compare cost of serialization of a page of questions to indented JSON
+    (as API did before) and to compact JSON of api.responses
+    """
+    help = 'Compare cost of indented and compact JSON of a page of questions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=10,
+                            help='number of questions on the page')
+        parser.add_argument('--number', type=int, default=1000,
+                            help='number of serializations of the page')
+
+    def handle(self, *args, **options):
+        questions = list(Question.get_listing_queryset('-rating', '-id')[:options['batch']])
+        if not questions:
+            raise CommandError('There are no questions in the database')
+
+        data = QuestionBatchSerializer(questions, many=True).data
+        encoders = (
+            ('indented json', lambda: json.dumps(data, indent=4).encode()),
+            ('compact {}'.format('orjson' if responses.orjson else 'json'),
+             lambda: responses.dumps(data)),
+        )
+
+        self.stdout.write('Page of {} questions, {} runs, time of one run:'.format(
+            len(questions), options['number']))
+
+        for name, encode in encoders:
+            encoding = timeit.timeit(encode, number=options['number'])
+            total = timeit.timeit(
+                lambda: (QuestionBatchSerializer(questions, many=True).data, encode()),
+                number=options['number'])
+
+            self.stdout.write('{name:>16}: {size:>7} bytes, encoding {encoding:8.1f} us, '
+                              'serializer and encoding {total:8.1f} us'.format(
+                                  name=name, size=len(encode()),
+                                  encoding=encoding / options['number'] * 10 ** 6,
+                                  total=total / options['number'] * 10 ** 6))
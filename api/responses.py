@@ -0,0 +1,41 @@
+import json
+
+from http import HTTPStatus
+
+from django.http import HttpResponse
+
+# orjson is optional, it encodes several times faster than json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CONTENT_TYPE = 'application/json'
+
+
+# ********************* FUNCTIONS **********************#
+
+def dumps(data, pretty=False):
+    """
+    :param data: serialized data
+    :param pretty: indent data for reading by human
+    :return: data encoded to JSON bytes, compact unless pretty is asked
+    """
+    if pretty:
+        return json.dumps(data, indent=4, ensure_ascii=False).encode()
+
+    if orjson is not None:
+        return orjson.dumps(data)
+
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def json_response(request, data, status=HTTPStatus.OK):
+    """
+    :param request: HTTP request, ?pretty=1 asks for indented JSON
+    :param data: serialized data
+    :param status: HTTP status of response
+    :return: HTTP response with JSON content
+    """
+    return HttpResponse(dumps(data, pretty=request.GET.get('pretty') == '1'),
+                        content_type=CONTENT_TYPE, status=status)
@@ -33,8 +33,11 @@ class QuestionSerializer(serializers.Serializer):
 
     def get_number_of_answers(self, obj):
         """
-        :return: number of answers for number_of_answer field
+        :return: number of answers for number_of_answer field,
+                 annotated value is used if question comes from listing
         """
+        if hasattr(obj, 'number_of_answers'):
+            return obj.number_of_answers
         return obj.answer_set.count()
 
 
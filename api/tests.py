@@ -1,11 +1,15 @@
 import json
 
 from http import HTTPStatus
+from io import StringIO
 
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
 from django.utils import timezone
 
+from questions import tag_index, trending
 from questions.models import Question, Tag
 
 
@@ -17,12 +21,19 @@ class HaskerApiTest(APITestCase):
         -> answers
         -> question_info
         -> search
+        -> suggestions of tags
+        -> compact and pretty JSON
+        -> conditional GET of question and answers
+        -> several questions at once
+        -> export for staff
     """
 
     def setUp(self):
         """
         Set up consist of creating two users, two questions, vote and answer
         """
+        trending.invalidate()
+
         self.user1 = User.objects.create_user(
             username='johndoe',
             email='johndoe@somemail.mail',
@@ -122,6 +133,19 @@ class HaskerApiTest(APITestCase):
         self.assertEqual(len(json_response), 1)
         self.assertEqual(json_response[0]["id"], self.question2.id)
 
+        # Page is the default
+        response = self.client.get('/rest/index/?batch=1')
+        self.assertEqual(json.loads(response.content.decode('utf-8'))['page'], 1)
+
+    def test_incorrect_batch(self):
+        for batch in ('abc', '-1', '0'):
+            response = self.client.get('/rest/index/', {'batch': batch})
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+        with self.settings(BATCH_LIMIT=1):
+            response = self.client.get('/rest/index/', {'batch': 1000})
+        self.assertEqual(len(json.loads(response.content.decode('utf-8'))['questions']), 1)
+
     def test_question_info(self):
         self.client.credentials(HTTP_AUTHORIZATION='JWT {}'.format(self.token))
 
@@ -155,3 +179,138 @@ class HaskerApiTest(APITestCase):
         json_response = json.loads(response.content.decode('utf-8'))
         self.assertEqual(len(json_response), 2)
         self.assertEqual(json_response[0]["id"], self.question1.id)
+
+    def test_index_queries(self):
+        for batch in (1, 10):
+            with self.assertNumQueries(2):
+                response = self.client.get('/rest/index/?batch={}&cursor='.format(batch))
+
+            json_response = json.loads(response.content.decode('utf-8'))["questions"]
+            self.assertEqual(json_response[0]["number_of_answers"], 0)
+
+    def test_cursor(self):
+        response = self.client.get('/rest/index/?batch=1&data=d&cursor=')
+
+        json_response = json.loads(response.content.decode('utf-8'))
+        self.assertNotIn('page', json_response)
+        self.assertTrue(json_response['has next'])
+        self.assertFalse(json_response['has prev'])
+        self.assertEqual(json_response['questions'][0]['id'], self.question2.id)
+
+        response = self.client.get('/rest/index/?batch=1&data=d&cursor={}'.format(
+            json_response['next cursor']))
+
+        json_response = json.loads(response.content.decode('utf-8'))
+        self.assertFalse(json_response['has next'])
+        self.assertTrue(json_response['has prev'])
+        self.assertEqual(json_response['questions'][0]['id'], self.question1.id)
+
+        response = self.client.get('/rest/index/?batch=1&data=d&cursor={}'.format(
+            json_response['prev cursor']))
+
+        json_response = json.loads(response.content.decode('utf-8'))
+        self.assertFalse(json_response['has prev'])
+        self.assertEqual(json_response['questions'][0]['id'], self.question2.id)
+
+    def test_tags_suggest(self):
+        self.question2.question_tags.add(self.tag, Tag.objects.create(tag_text='Mountain'))
+        Tag.objects.create(tag_text='moon')
+        tag_index.invalidate()
+
+        for prefix in ('m', 'mo', 'MO'):
+            response = self.client.get('/rest/tags/suggest/', {'prefix': prefix})
+            json_response = json.loads(response.content.decode('utf-8'))
+            self.assertEqual(json_response, [{'tag': 'move', 'questions': 2},
+                                             {'tag': 'Mountain', 'questions': 1},
+                                             {'tag': 'moon', 'questions': 0}])
+
+        # Index is not rebuilt on every request
+        with self.assertNumQueries(0):
+            response = self.client.get('/rest/tags/suggest/', {'prefix': 'mou'})
+
+        json_response = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(json_response, [{'tag': 'Mountain', 'questions': 1}])
+
+        # Characters out of BMP are after '\uffff'
+        Tag.objects.create(tag_text='mou\U0001f600')
+        tag_index.invalidate()
+        response = self.client.get('/rest/tags/suggest/', {'prefix': 'mou'})
+        self.assertEqual([tag['tag'] for tag in json.loads(response.content.decode('utf-8'))],
+                         ['Mountain', 'mou\U0001f600'])
+
+    def test_compact_json(self):
+        response = self.client.get('/rest/index/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b'\n', response.content)
+
+        pretty = self.client.get('/rest/index/', {'pretty': 1})
+        self.assertIn(b'\n    ', pretty.content)
+        self.assertEqual(json.loads(pretty.content), json.loads(response.content))
+
+    def test_benchmark_json(self):
+        out = StringIO()
+        call_command('benchmark_json', number=1, stdout=out)
+        self.assertIn('compact', out.getvalue())
+
+    @override_settings(FRAGMENT_CACHE='default')
+    def test_conditional_get(self):
+        self.client.credentials(HTTP_AUTHORIZATION='JWT {}'.format(self.token))
+
+        for url in ('/rest/question/', '/rest/answers/'):
+            response = self.client.get(url, {'question_id': self.question2.id})
+            self.assertIn('Last-Modified', response)
+
+            etag = response['ETag']
+            response = self.client.get(url, {'question_id': self.question2.id},
+                                       HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        # Other page of answers has other ETag
+        response = self.client.get('/rest/answers/', {'question_id': self.question2.id,
+                                                      'page': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        self.client.post(self.question2.get_url(), {'Text': 'One more answer'})
+        response = self.client.get('/rest/answers/', {'question_id': self.question2.id},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_questions(self):
+        self.client.credentials(HTTP_AUTHORIZATION='JWT {}'.format(self.token))
+        ids = '{},0,{}'.format(self.question2.id, self.question1.id)
+
+        # User of the token, questions and their tags
+        with self.assertNumQueries(3):
+            response = self.client.get('/rest/questions/', {'ids': ids})
+
+        json_response = json.loads(response.content.decode('utf-8'))['questions']
+        self.assertEqual([question['id'] for question in json_response],
+                         [self.question2.id, 0, self.question1.id])
+        self.assertEqual(json_response[0]['number_of_answers'], 1)
+        self.assertEqual(json_response[1]['error'], 'no question with this id')
+        self.assertEqual(json_response[2]['question_tags'], ['move'])
+
+        for ids in ('', 'one,two', ','.join(['1'] * 51)):
+            response = self.client.get('/rest/questions/', {'ids': ids})
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_export(self):
+        self.client.credentials(HTTP_AUTHORIZATION='JWT {}'.format(self.token))
+        self.assertEqual(self.client.get('/rest/export/').status_code, HTTPStatus.FORBIDDEN)
+
+        self.user1.is_staff = True
+        self.user1.save()
+
+        response = self.client.get('/rest/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([record['type'] for record in records],
+                         ['question', 'question', 'answer', 'question_vote'])
+        self.assertEqual(records[0]['question_tags'], ['move'])
+
+        response = self.client.get('/rest/export/', {'since': '2000-01-01'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+
+        response = self.client.get('/rest/export/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
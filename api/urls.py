@@ -8,9 +8,12 @@ app_name = 'api'
 urlpatterns = [
     path('answers/', views.get_api_answers, name='get_answers'),
     path('api-token-auth/', obtain_jwt_token, name='obtain_token'),
+    path('export/', views.get_api_export, name='export'),
     path('index/', views.get_api_index, name='index'),
     path('question/', views.get_api_question, name='get_question'),
+    path('questions/', views.get_api_questions, name='get_questions'),
     path('search/', views.get_api_search, name='search'),
+    path('tags/suggest/', views.get_api_tags_suggest, name='tags_suggest'),
     path('trending/', views.get_api_trending, name='trending'),
     re_path(r'.*', views.get_api_help, name='help'),
 ]
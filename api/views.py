@@ -1,18 +1,20 @@
-import json
-
 from http import HTTPStatus
 
-from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET
 
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
+from .responses import json_response
 from .serializers import AnswerSerializer, QuestionSerializer, \
     QuestionBatchSerializer, QuestionTrendingSerializer
 
+from questions import export, tag_index, vote_buffer
+from questions.conditional import question_condition
 from questions.models import Answer, Question
+from questions.pagination import get_batch
 
 # Get Help from README and returns it on /rest/ uri and
 # all uris with prefix /rest/ that are not present in api/urls.py
@@ -25,6 +27,7 @@ with open('api/README.md') as readme:
 
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
+@question_condition(lambda request: request.GET.get('question_id'))
 def get_api_answers(request):
     """
     :param request: HTTP request
@@ -32,52 +35,54 @@ def get_api_answers(request):
     """
     question_id = request.GET.get('question_id')
     if not question_id:
-        return HttpResponse(content=json.dumps({"error": "no id in request"}),
-                            status=HTTPStatus.BAD_REQUEST)
+        return json_response(request, {"error": "no id in request"},
+                             status=HTTPStatus.BAD_REQUEST)
 
     answers, page, *_ = Answer.get_answers_page(request)
     serialized_answers = AnswerSerializer(answers, many=True)
-    return HttpResponse(
-        json.dumps({
-            "question_id": question_id,
-            "page": page,
-            'has next': answers.has_next(),
-            'has prev': answers.has_previous(),
-            "answers": serialized_answers.data}, indent=4))
+    return json_response(request, {
+        "question_id": question_id,
+        "page": page,
+        'has next': answers.has_next(),
+        'has prev': answers.has_previous(),
+        "answers": serialized_answers.data})
 
 
 @require_GET
 def get_api_index(request):
     """
     :param request: HTTP request
-    :return: one page with questions sorted by date or rating in json format
+    :return: one page with questions sorted by date or rating in json format,
+             page is found by number of page or by cursor if it is given
     """
     paginate_by = request.GET.get('data', 't')
-    batch = request.GET.get('batch', 10)
-    page = request.GET.get('page', 1)
+    try:
+        batch = get_batch(request.GET.get('batch'), 10)
+    except ValueError:
+        return json_response(request, {"error": "batch should be a positive number"},
+                             status=HTTPStatus.BAD_REQUEST)
 
-    # Get right sorting
-    questions = Question.objects.order_by('-{by}'.format(
-        by='pub_date' if paginate_by == 'd' else 'rating'))
+    questions, page = Question.get_listing_page(request, batch)
+    questions_serialized = QuestionBatchSerializer(questions, many=True)
 
-    # Create Paginator
-    paginator = Paginator(questions, batch)
-    questions = paginator.get_page(page)
+    response = {'page': page} if page is not None else {
+        'next cursor': questions.next_cursor,
+        'prev cursor': questions.previous_cursor,
+    }
 
-    questions_serialized = QuestionBatchSerializer(questions, many=True)
+    response.update({
+        'sort by': {'d': 'date', 'h': 'hot'}.get(paginate_by, 'rating'),
+        'has next': questions.has_next(),
+        'has prev': questions.has_previous(),
+        'questions': questions_serialized.data,
+    })
 
-    return HttpResponse(
-        json.dumps({
-            'page': questions.number,
-            'sort by': 'date' if paginate_by == 'd' else 'rating',
-            'has next': questions.has_next(),
-            'has prev': questions.has_previous(),
-            'questions': questions_serialized.data,
-        }, indent=4))
+    return json_response(request, response)
 
 
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
+@question_condition(lambda request: request.GET.get('question_id'))
 def get_api_question(request):
     """
     :param request: HTTP request
@@ -85,16 +90,51 @@ def get_api_question(request):
     """
     question_id = request.GET.get('question_id')
     if not question_id:
-        return HttpResponse(content=json.dumps({"error": "no id in request"}),
-                            status=HTTPStatus.BAD_REQUEST)
+        return json_response(request, {"error": "no id in request"},
+                             status=HTTPStatus.BAD_REQUEST)
 
     try:
         question = Question.objects.get(id=question_id)
     except Question.DoesNotExist:
-        return HttpResponse(content=json.dumps({"error": "no question with this id"}),
-                            status=HTTPStatus.NOT_FOUND)
+        return json_response(request, {"error": "no question with this id"},
+                             status=HTTPStatus.NOT_FOUND)
 
-    return HttpResponse(json.dumps(QuestionSerializer(question).data, indent=4))
+    question, = vote_buffer.merge_pending('q', [question])
+    return json_response(request, QuestionSerializer(question).data)
+
+
+@api_view(['GET'])
+@permission_classes((IsAuthenticated,))
+def get_api_questions(request):
+    """
+    :param request: HTTP request with ids of questions separated with commas
+    :return: full information about every question in json format in order
+             of ids, questions which do not exist are marked with error
+    """
+    try:
+        ids = [int(id_) for id_ in request.GET.get('ids', '').split(',') if id_.strip()]
+    except ValueError:
+        return json_response(request, {"error": "ids should be numbers"},
+                             status=HTTPStatus.BAD_REQUEST)
+
+    if not ids:
+        return json_response(request, {"error": "no ids in request"},
+                             status=HTTPStatus.BAD_REQUEST)
+
+    if len(ids) > settings.API_QUESTIONS_LIMIT:
+        return json_response(request, {"error": "more than {} ids in request".format(
+            settings.API_QUESTIONS_LIMIT)}, status=HTTPStatus.BAD_REQUEST)
+
+    # Tags, authors and numbers of answers of all questions are taken at once
+    questions = vote_buffer.merge_pending('q', Question.get_listing_queryset().filter(
+        id__in=ids))
+    serialized = {question['id']: question
+                  for question in QuestionSerializer(questions, many=True).data}
+
+    return json_response(request, {
+        'questions': [serialized.get(id_, {'id': id_, 'error': 'no question with this id'})
+                      for id_ in ids],
+    })
 
 
 @api_view(['GET'])
@@ -107,32 +147,65 @@ def get_api_search(request):
     search_query = request.GET.get("search")
 
     if not search_query:
-        return HttpResponse(content=json.dumps({"error": "empty search query"}),
-                            status=HTTPStatus.BAD_REQUEST)
+        return json_response(request, {"error": "empty search query"},
+                             status=HTTPStatus.BAD_REQUEST)
 
     search_query = search_query.split()
     questions, page = Question.get_search_result(request, search_query)
 
     questions_serialized = QuestionBatchSerializer(questions, many=True)
 
-    return HttpResponse(
-        json.dumps({
-            'page': page,
-            'has next': questions.has_next() if questions else None,
-            'has prev': questions.has_previous() if questions else None,
-            'questions': questions_serialized.data,
-        }, indent=4))
+    return json_response(request, {
+        'page': page,
+        'has next': questions.has_next() if questions else None,
+        'has prev': questions.has_previous() if questions else None,
+        'questions': questions_serialized.data,
+    })
 
 
 @require_GET
-def get_api_trending(_):
+def get_api_trending(request):
     """
     :return: top 5 questions by rating in json format
     """
 
     questions = Question.get_trending_question()
     serialized_questions = QuestionTrendingSerializer(questions, many=True)
-    return HttpResponse(json.dumps(serialized_questions.data, indent=4))
+    return json_response(request, serialized_questions.data)
+
+
+@require_GET
+def get_api_tags_suggest(request):
+    """
+    :param request: HTTP request
+    :return: tags which start with prefix sorted by number of questions
+             in json format, tags are taken from index in memory
+    """
+    prefix = request.GET.get('prefix', '').strip()
+
+    return json_response(request, [
+        {'tag': tag_text, 'questions': number_of_questions}
+        for tag_text, number_of_questions in tag_index.suggest(prefix)])
+
+
+@api_view(['GET'])
+@permission_classes((IsAdminUser,))
+def get_api_export(request):
+    """
+    :param request: HTTP request of staff user
+    :return: stream of NDJSON with all questions, answers and votes,
+             since parameter limits it to questions changed since the date
+    """
+    since = request.GET.get('since')
+    if since:
+        try:
+            since = export.parse_since(since)
+        except ValueError:
+            return json_response(request, {"error": "incorrect since date"},
+                                 status=HTTPStatus.BAD_REQUEST)
+
+    return StreamingHttpResponse(export.iter_ndjson(since or None),
+                                 content_type='application/x-ndjson')
 
 
 @require_GET
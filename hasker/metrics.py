@@ -0,0 +1,291 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends import django as django_backend
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Name of metric -> (type, help)
+METRICS = {
+    'hasker_requests_total': ('counter', 'Number of requests'),
+    'hasker_request_duration_seconds': ('histogram', 'Time of requests'),
+    'hasker_db_queries_total': ('counter', 'Number of SQL queries'),
+    'hasker_db_query_seconds_total': ('counter', 'Time of SQL queries'),
+    'hasker_template_render_seconds_total': ('counter', 'Time of rendering of templates'),
+    'hasker_response_bytes_total': ('counter', 'Size of responses'),
+}
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_store = None
+_store_lock = threading.Lock()
+
+
+class MetricsStore:
+    """
+    Metrics of one process. They are written to a file of the process in
+    settings.METRICS_DIR at most every settings.METRICS_FLUSH_INTERVAL
+    seconds, /metrics sums files of all processes (e.g. gunicorn workers).
+    Files of finished processes are kept, so counters do not go back.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed = 0
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe_histogram(self, name, labels, value):
+        key = (name, labels)
+        buckets = settings.METRICS_BUCKETS
+        if key not in self.histograms:
+            self.histograms[key] = [[0] * len(buckets), 0, 0]
+
+        histogram = self.histograms[key]
+        for number, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[0][number] += 1
+                break
+        histogram[1] += value
+        histogram[2] += 1
+
+    def observe(self, view, method, status, duration, queries, query_time, render_time, size):
+        """
+        Add metrics of one request
+        """
+        with self.lock:
+            self.inc('hasker_requests_total', (view, method, str(status)))
+            self.observe_histogram('hasker_request_duration_seconds', (view,), duration)
+            self.inc('hasker_db_queries_total', (view,), queries)
+            self.inc('hasker_db_query_seconds_total', (view,), query_time)
+            self.inc('hasker_template_render_seconds_total', (view,), render_time)
+            self.inc('hasker_response_bytes_total', (view,), size)
+
+            # Only one thread of a burst of requests flushes
+            due = time.monotonic() - self.flushed > settings.METRICS_FLUSH_INTERVAL
+            if due:
+                self.flushed = time.monotonic()
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write metrics to file of the process, file is replaced atomically
+        """
+        # Files are written one by one, so older metrics do not replace newer
+        with self.flush_lock:
+            with self.lock:
+                self.flushed = time.monotonic()
+                data = json.dumps({
+                    'counters': [[name, labels, value]
+                                 for (name, labels), value in self.counters.items()],
+                    'histograms': [[name, labels, histogram]
+                                   for (name, labels), histogram in self.histograms.items()],
+                })
+
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            descriptor, temporary_path = tempfile.mkstemp(dir=settings.METRICS_DIR,
+                                                          suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'w') as file:
+                    file.write(data)
+                os.replace(temporary_path, os.path.join(
+                    settings.METRICS_DIR, '{}.json'.format(self.pid)))
+            except OSError:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+                raise
+
+
+class Template(django_backend.Template):
+    """
+    Template which adds time of rendering to metrics of the request
+    """
+
+    def render(self, context=None, request=None):
+        # Templates rendered inside other template (e.g. holes) are counted once
+        depth = getattr(_local, 'depth', None)
+        if depth is None or depth > 0:
+            return super().render(context, request)
+
+        _local.depth = 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            _local.render_time += time.perf_counter() - started
+            _local.depth = 0
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """
+    Django templates backend with time of rendering in metrics
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+class MetricsMiddleware:
+    """
+    Collects number and time of requests, SQL queries, rendering of
+    templates and size of responses by name of URL pattern of view
+    (e.g. questions:paginate_data). Time of streaming responses does
+    not include streaming of content.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - started
+
+        _local.depth, _local.render_time = 0, 0.0
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_query):
+                response = self.get_response(request)
+        finally:
+            render_time, _local.depth = _local.render_time, None
+        duration = time.perf_counter() - started
+
+        # Failure of metrics does not fail the request
+        try:
+            get_store().observe(
+                get_view_name(request), request.method, response.status_code, duration,
+                queries[0], queries[1], render_time,
+                0 if response.streaming else len(response.content))
+        except Exception:
+            logger.exception('Metrics of request are not collected')
+        return response
+
+
+# ********************* FUNCTIONS ********************#
+
+def get_store():
+    """
+    :return: MetricsStore of this process, forked process gets a new one
+    """
+    global _store
+
+    if _store is None or _store.pid != os.getpid():
+        with _store_lock:
+            if _store is None or _store.pid != os.getpid():
+                _store = MetricsStore()
+    return _store
+
+
+def get_view_name(request):
+    """
+    :return: name of URL pattern with namespace or 'unresolved'
+    """
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None and match.view_name else 'unresolved'
+
+
+def collect():
+    """
+    :return: (counters, histograms) summed over files of all processes
+    """
+    counters, histograms = {}, {}
+
+    if not os.path.isdir(settings.METRICS_DIR):
+        return counters, histograms
+
+    for file_name in os.listdir(settings.METRICS_DIR):
+        if not file_name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(settings.METRICS_DIR, file_name)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+
+        for name, labels, value in data['counters']:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+
+        for name, labels, (buckets, total, count) in data['histograms']:
+            key = (name, tuple(labels))
+            histogram = histograms.setdefault(key, [[0] * len(buckets), 0, 0])
+            histogram[0] = [old + new for old, new in zip(histogram[0], buckets)]
+            histogram[1] += total
+            histogram[2] += count
+
+    return counters, histograms
+
+
+def format_labels(names, values):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace(
+        '"', '\\"').replace('\n', '\\n')) for name, value in zip(names, values))
+
+
+def render(counters, histograms):
+    """
+    :return: metrics in Prometheus text format
+    """
+    label_names = {'hasker_requests_total': ('view', 'method', 'status')}
+    lines = []
+
+    for name, (metric_type, metric_help) in METRICS.items():
+        lines.append('# HELP {} {}'.format(name, metric_help))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        names = label_names.get(name, ('view',))
+
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append('{}{{{}}} {}'.format(name, format_labels(names, labels), value))
+
+        for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(settings.METRICS_BUCKETS, buckets):
+                cumulative += bucket
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                    name, format_labels(names, labels), bound, cumulative))
+            lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(
+                name, format_labels(names, labels), count))
+            lines.append('{}_sum{{{}}} {}'.format(name, format_labels(names, labels), total))
+            lines.append('{}_count{{{}}} {}'.format(name, format_labels(names, labels), count))
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    :param request: HTTP request from settings.METRICS_ALLOWED_IPS or from staff user
+    :return: metrics of all processes in Prometheus text format
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and \
+            not request.user.is_staff:
+        return HttpResponseForbidden()
+
+    get_store().flush()
+    return HttpResponse(render(*collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,83 @@
+import cProfile
+import datetime
+import json
+import os
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connection
+
+from hasker import metrics, slow_queries
+
+# Header of request which asks for profile and header of response with summary
+REQUEST_HEADER = 'HTTP_X_PROFILE'
+RESPONSE_HEADER = 'X-Profile-Summary'
+
+
+class ProfilerMiddleware:
+    """
+    Runs the view under cProfile if staff user sends header X-Profile: 1
+    or for random settings.PROFILE_SAMPLE_RATE share of requests. Stats
+    (<name>.prof, read with pstats or snakeviz) and SQL queries of the view
+    (<name>.sql.json) are written to settings.PROFILE_DIR. Staff user gets
+    summary in X-Profile-Summary header of the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        asked = request.META.get(REQUEST_HEADER) == '1' and request.user.is_staff
+        if not asked and random.random() >= settings.PROFILE_SAMPLE_RATE:
+            return self.get_response(request)
+
+        queries = []
+
+        def record_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                frame = slow_queries.get_project_frame()
+                queries.append({
+                    'sql': sql,
+                    'duration': round(time.perf_counter() - started, 6),
+                    'frame': '{}:{}:{}'.format(*frame) if frame else None,
+                })
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        with connection.execute_wrapper(record_query):
+            response = profile.runcall(self.get_response, request)
+        duration = time.perf_counter() - started
+
+        name = write_profile(profile, queries, metrics.get_view_name(request))
+        if asked:
+            response[RESPONSE_HEADER] = 'time={:.6f}; queries={}; sql_time={:.6f}; ' \
+                                        'profile={}'.format(duration, len(queries),
+                                                            sum(query['duration']
+                                                                for query in queries), name)
+        return response
+
+
+# ********************* FUNCTIONS ********************#
+
+def write_profile(profile, queries, view):
+    """
+    :param profile: cProfile.Profile of the view
+    :param queries: list of dicts of SQL queries of the view
+    :param view: name of URL pattern of the view
+    :return: name of files of the profile in settings.PROFILE_DIR
+    """
+    name = '{}-{}-{}'.format(datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S'),
+                             view.replace(':', '_'), uuid.uuid4().hex[:8])
+    path = os.path.join(settings.PROFILE_DIR, name)
+
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile.dump_stats(path + '.prof')
+    with open(path + '.sql.json', 'w') as file:
+        json.dump({'view': view, 'queries': queries}, file, indent=4)
+
+    return name
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/2.0/ref/settings/
 import datetime
 import os
 import sys
+import tempfile
 
 import django_heroku
 import dj_database_url
@@ -55,11 +56,14 @@ MIDDLEWARE = [
     # Simplified static file serving.
     # https://warehouse.python.org/project/whitenoise/
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'hasker.metrics.MetricsMiddleware',
+    'hasker.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'hasker.profiler.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -73,7 +77,8 @@ ROOT_URLCONF = 'hasker.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django templates with time of rendering in metrics
+        'BACKEND': 'hasker.metrics.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -167,13 +172,176 @@ EMAIL_HOST_PASSWORD = None  # Add your password
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 
+# Notifications about new answers are queued in the database and sent by
+# manage.py send_notifications. Worker claims NOTIFICATION_BATCH jobs for
+# NOTIFICATION_LOCK_TIMEOUT seconds, job which is not sent is retried after
+# NOTIFICATION_RETRY_DELAY seconds (doubled with every attempt) and marked
+# as failed after NOTIFICATION_MAX_ATTEMPTS attempts.
+
+NOTIFICATION_BATCH = 100
+NOTIFICATION_LOCK_TIMEOUT = 300
+NOTIFICATION_RETRY_DELAY = 60
+NOTIFICATION_MAX_ATTEMPTS = 5
+
+# In digest mode notification waits NOTIFICATION_DIGEST_WINDOW seconds and then
+# all new answers to questions of the same author are sent in one email
+
+NOTIFICATION_DIGEST = False
+NOTIFICATION_DIGEST_WINDOW = 600
+
 # Number of batches for paginator for different sections of site
 
 BATCH_ON_PAGE = 8
 SEARCH_BATCH = 8
 ANSWERS_BATCH = 8
+
+# Maximum number of questions in one request of /rest/questions/
+API_QUESTIONS_LIMIT = 50
+
+# Maximum number of objects on one page, larger batch from request is cut
+BATCH_LIMIT = 100
+
+# Number of rows read from the database at once by export
+EXPORT_CHUNK_SIZE = 2000
+
+# Number of records written with one query by import_qa
+IMPORT_BATCH = 1000
+
+# Number of profiles created with one query by create_profiles
+CREATE_PROFILES_BATCH = 1000
+
+# manage.py benchmark_views fails if a view makes more SQL queries than its
+# budget in BENCHMARK_QUERY_BUDGETS (by name of URL pattern) or BENCHMARK_QUERY_BUDGET
+
+BENCHMARK_QUERY_BUDGET = 10
+BENCHMARK_QUERY_BUDGETS = {
+    'home': 2,
+    'questions:ask': 5,
+    'questions:get_answers': 4,
+    'questions:get_search': 7,
+    'questions:mark_answer': 8,
+    'questions:paginate_data': 4,
+    'questions:search': 2,
+    'questions:trending_data': 3,
+    'questions:vote': 8,
+    'questions:question_info': 8,
+    'questions:not_found': 1,
+    'api:get_answers': 6,
+    'api:obtain_token': 2,
+    'api:export': 9,
+    'api:index': 4,
+    'api:get_question': 8,
+    'api:get_questions': 5,
+    'api:search': 7,
+    'api:tags_suggest': 2,
+    'api:trending': 2,
+    'api:help': 1,
+}
+
 TRENDING_BATCH = 5
 
+# Metrics of views are collected by every process and written to METRICS_DIR
+# every METRICS_FLUSH_INTERVAL seconds, /metrics shows metrics of all processes
+# in Prometheus format to METRICS_ALLOWED_IPS and staff users
+
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'hasker-metrics')
+METRICS_FLUSH_INTERVAL = 1
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# SQL queries of views longer than SLOW_QUERY_THRESHOLD seconds and random
+# SLOW_QUERY_SAMPLE_RATE share of other queries are written to SLOW_QUERY_LOG
+# (JSON lines), manage.py slowqueries summarizes them. Log is written by all
+# processes, so it is rotated by external logrotate, not by the processes
+
+SLOW_QUERY_LOG = os.path.join(tempfile.gettempdir(), 'hasker-slow-queries.jsonl')
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_SAMPLE_RATE = 0
+
+# Views are profiled for staff users who send header X-Profile: 1 and for random
+# PROFILE_SAMPLE_RATE share of requests, profiles are written to PROFILE_DIR
+
+PROFILE_DIR = os.path.join(tempfile.gettempdir(), 'hasker-profiles')
+PROFILE_SAMPLE_RATE = 0
+
+# Caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'votes': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'votes',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Write-behind buffer for votes. If it is on ratings are accumulated in the
+# VOTE_BUFFER_CACHE and flushed to the database in batches by flusher thread
+# (every VOTE_BUFFER_FLUSH_INTERVAL seconds) or by manage.py flush_votes.
+# Cache not shared between processes (locmem) requires flusher thread.
+# Pending delta expires VOTE_BUFFER_DELTA_TIMEOUT seconds after the last vote
+# for the object, so the buffer must be flushed more often than that.
+
+VOTE_BUFFER = False
+VOTE_BUFFER_CACHE = 'votes'
+VOTE_BUFFER_BATCH = 500
+VOTE_BUFFER_FLUSH_INTERVAL = 5
+VOTE_BUFFER_LOCK_TIMEOUT = 60
+VOTE_BUFFER_DELTA_TIMEOUT = 3600
+
+# Trending list is cached with TRENDING_CACHE_FACTOR times more questions
+# than TRENDING_BATCH and is updated on votes by the process which got the vote,
+# so TRENDING_CACHE must be an alias of a cache shared by all processes (redis,
+# memcached). The list is eventually consistent: it is rebuilt at least every
+# TRENDING_TIMEOUT seconds. None -> list is read from the database every time.
+
+TRENDING_CACHE = None
+TRENDING_CACHE_FACTOR = 4
+TRENDING_TIMEOUT = 300
+TRENDING_LOCK_TIMEOUT = 5
+
+# Rendered AJAX fragments (pages of listings, answers and trending) are cached
+# in FRAGMENT_CACHE by GET parameters and versions of their data. Votes, answers
+# and changes of questions and profiles bump versions, FRAGMENT_CACHE_TIMEOUT
+# limits age of relative dates in the fragments. Version is bumped by the process
+# which changed the data, so FRAGMENT_CACHE must be an alias of a cache shared
+# by all processes (redis, memcached). None turns off caching of fragments and
+# conditional GET of questions (their ETag includes versions).
+
+FRAGMENT_CACHE = None
+FRAGMENT_CACHE_TIMEOUT = 60
+
+# Pages are cached as they are rendered for anonymous user in FRAGMENT_CACHE,
+# authenticated users get the same pages with their holes filled for them
+
+PAGE_CACHE_TIMEOUT = 300
+
+# Suggestions of tags are taken from index in memory of every process,
+# it is rebuilt every TAG_INDEX_TIMEOUT seconds
+
+TAG_SUGGEST_LIMIT = 10
+TAG_INDEX_TIMEOUT = 60
+
+# Hot score of a question grows by one with every HOT_SCORE_DECAY seconds
+# of publication time and with every order of magnitude of its rating plus
+# HOT_SCORE_ANSWER_WEIGHT for every answer
+
+HOT_SCORE_DECAY = 45000
+HOT_SCORE_ANSWER_WEIGHT = 2
+HOT_SCORE_BATCH = 1000
+
+# Full text search. Backend is chosen by database if SEARCH_BACKEND is None:
+# PostgreSQL -> questions.search.PostgresSearchBackend
+# SQLite     -> questions.search.SQLiteSearchBackend
+# other      -> questions.search.SearchBackend
+# SEARCH_CONFIG is text search configuration of PostgreSQL, run
+# manage.py rebuild_search_index after it is changed
+
+SEARCH_BACKEND = None
+SEARCH_CONFIG = 'english'
+
 # Logging configuration
 
 if not DEBUG:
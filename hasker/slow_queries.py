@@ -0,0 +1,158 @@
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from logging.handlers import WatchedFileHandler
+
+from django.conf import settings
+from django.db import connection
+
+from hasker import metrics
+
+# Literals and lists of parameters are replaced, so the same query
+# with other values has the same text
+NORMALIZATIONS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+# Frames of middlewares of hasker package are not the place of a query
+IGNORED_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+logger = logging.getLogger('hasker.slow_queries')
+logger.propagate = False
+logger.setLevel(logging.INFO)
+
+_handler_lock = threading.Lock()
+
+
+class SlowQueryMiddleware:
+    """
+    Writes SQL queries of views which take more than settings.SLOW_QUERY_THRESHOLD
+    seconds and random settings.SLOW_QUERY_SAMPLE_RATE share of other queries
+    to settings.SLOW_QUERY_LOG (JSON lines), see manage.py slowqueries
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+
+        def log_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.perf_counter() - started
+                slow = duration >= settings.SLOW_QUERY_THRESHOLD
+                if slow or random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+                    write_entry(sql, duration, metrics.get_view_name(request), slow)
+
+        with connection.execute_wrapper(log_query):
+            return self.get_response(request)
+
+
+# ********************* FUNCTIONS ********************#
+
+def normalize(sql):
+    """
+    :return: text of query without values
+    """
+    for pattern, replacement in NORMALIZATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_project_frame():
+    """
+    :return: (path relative to the project, function, line) of the innermost
+             frame of project code which made the query or None
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(settings.BASE_DIR + os.sep) and 'site-packages' not in filename \
+                and not filename.startswith(IGNORED_DIR):
+            return (os.path.relpath(filename, settings.BASE_DIR), frame.f_code.co_name,
+                    frame.f_lineno)
+        frame = frame.f_back
+    return None
+
+
+def get_handler():
+    """
+    :return: handler of the log, it is created again if settings.SLOW_QUERY_LOG changes
+
+    Log is shared by processes (e.g. gunicorn workers), so it is not rotated
+    by them: every line is appended and the file is opened again after it is
+    moved by external logrotate
+    """
+    path = os.path.abspath(settings.SLOW_QUERY_LOG)
+
+    with _handler_lock:
+        if not logger.handlers or logger.handlers[0].baseFilename != path:
+            for handler in logger.handlers:
+                handler.close()
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = WatchedFileHandler(path)
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.handlers = [handler]
+
+    return logger.handlers[0]
+
+
+def write_entry(sql, duration, view, slow):
+    """
+    Write a query to the log, parameters are not written
+    """
+    frame = get_project_frame()
+    get_handler()
+    logger.info(json.dumps({
+        'time': datetime.datetime.utcnow().isoformat(),
+        'duration': round(duration, 6),
+        'sql': normalize(sql),
+        'view': view,
+        'frame': '{}:{}'.format(*frame) if frame else None,
+        'line': frame[2] if frame else None,
+        'slow': slow,
+        'pid': os.getpid(),
+    }))
+
+
+def iter_entries(path=None):
+    """
+    :param path: log, settings.SLOW_QUERY_LOG by default
+    :return: entries of the log and its files rotated by logrotate
+             (<log>.1, <log>.2 ..., compressed files are skipped), oldest first
+    """
+    path = os.path.abspath(path or settings.SLOW_QUERY_LOG)
+    directory, name = os.path.split(path)
+    rotated = re.compile(re.escape(name) + r'\.(\d+)$')
+
+    numbers = []
+    if os.path.isdir(directory):
+        for file_name in os.listdir(directory):
+            match = rotated.match(file_name)
+            if match:
+                numbers.append(int(match.group(1)))
+
+    paths = ['{}.{}'.format(path, number) for number in sorted(numbers, reverse=True)]
+    for log_path in paths + [path]:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path) as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,241 @@
+import collections
+import datetime
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.utils import timezone
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern
+from rest_framework_jwt.settings import api_settings
+
+from . import synthetic, tag_index
+from .models import Answer, Question, Tag
+
+# Request of a benchmark:
+#     name   -> name of URL pattern with namespace
+#     method -> 'get' or 'post'
+#     path   -> path of request
+#     params -> GET or POST parameters
+#     auth   -> None, 'session' or 'jwt'
+#     write  -> request changes data, it is done in transaction which is rolled back
+Endpoint = collections.namedtuple('Endpoint', 'name method path params auth write')
+
+Result = collections.namedtuple('Result', 'name path status p50 p95 queries budget')
+
+# Alias of cache of fragments and trending of the benchmark, it is
+# cleared before every URL, so caches of the site are not touched
+CACHE = 'benchmark'
+
+
+class Benchmark:
+    """
+    Requests every URL of questions and api applications with test client
+    in process and measures time and number of SQL queries. Fragments and
+    trending are cached in a separate cache which is cleared before requests
+    of every URL, so the first request is cold and the rest are served by
+    caches as they would be on the site. Number of queries is the maximum
+    of all requests.
+
+    Benchmark is a context manager: staff user of the benchmark (export is
+    only for staff) is created on enter and deleted on exit.
+    """
+
+    def __init__(self, repeat):
+        """
+        :param repeat: number of requests of every URL
+        """
+        self.repeat = repeat
+        self.user = None
+        self.token = None
+        self.client = Client()
+        self.settings = override_settings(
+            CACHES=dict(settings.CACHES, **{CACHE: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': CACHE,
+            }}),
+            FRAGMENT_CACHE=CACHE,
+            TRENDING_CACHE=CACHE)
+
+    def __enter__(self):
+        self.settings.enable()
+        try:
+            self.user = User.objects.create(
+                username='benchmark-{}'.format(uuid.uuid4().hex[:8]), is_staff=True,
+                password=UNUSABLE_PASSWORD_PREFIX)
+        except Exception:
+            self.settings.disable()
+            raise
+
+        self.token = api_settings.JWT_ENCODE_HANDLER(api_settings.JWT_PAYLOAD_HANDLER(self.user))
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self.client.logout()
+            self.user.delete()
+        finally:
+            self.settings.disable()
+
+    def get_endpoints(self):
+        """
+        :return: list of Endpoint, requests use the top rated question with answers
+        :raise ValueError: if there are no questions with answers in the database
+        """
+        answer = Answer.objects.select_related('related_question').order_by(
+            '-related_question__rating', '-id').first()
+        if answer is None:
+            raise ValueError('There are no answers in the database, run seed_synthetic')
+
+        question = answer.related_question
+        tag = Tag.objects.filter(question=question).first()
+        question_path = '/question/{}/{}.html'.format(question.id, question.question_title)
+        word = synthetic.WORDS[0]
+        since = (timezone.now() - datetime.timedelta(days=1)).isoformat()
+
+        return [
+            Endpoint('home', 'get', '/', {}, None, False),
+            Endpoint('questions:ask', 'get', '/ask/', {}, 'session', False),
+            Endpoint('questions:get_answers', 'get', '/get_answers/',
+                     {'question_id': question.id, 'page': 1}, None, False),
+            Endpoint('questions:get_search', 'get', '/get_search/',
+                     {'search': word, 'page': 1}, None, False),
+            Endpoint('questions:mark_answer', 'get', '/mark_right_answer/',
+                     {'answer_id': answer.id, 'is_right': 'true'}, 'session', True),
+            Endpoint('questions:paginate_data', 'get', '/paginate_data/',
+                     {'data': 't', 'cursor': ''}, None, False),
+            Endpoint('questions:search', 'get', '/search/', {}, None, False),
+            Endpoint('questions:trending_data', 'get', '/trending_data/',
+                     {}, None, False),
+            Endpoint('questions:vote', 'get', '/vote/',
+                     {'value': 'q {} {} up'.format(question.id, question.rating)},
+                     'session', True),
+            Endpoint('questions:question_info', 'get', question_path, {}, 'session', False),
+            Endpoint('questions:not_found', 'get', '/not/found/', {}, None, False),
+            Endpoint('api:get_answers', 'get', '/rest/answers/',
+                     {'question_id': question.id}, 'jwt', False),
+            # Password of benchmark user is unusable, so token is not given
+            Endpoint('api:obtain_token', 'post', '/rest/api-token-auth/',
+                     {'username': self.user.username, 'password': self.user.username},
+                     None, False),
+            Endpoint('api:export', 'get', '/rest/export/', {'since': since}, 'jwt', False),
+            Endpoint('api:index', 'get', '/rest/index/', {'data': 't'}, None, False),
+            Endpoint('api:get_question', 'get', '/rest/question/',
+                     {'question_id': question.id}, 'jwt', False),
+            Endpoint('api:get_questions', 'get', '/rest/questions/',
+                     {'ids': ','.join(str(id_) for id_ in Question.objects.order_by(
+                         '-id').values_list('id', flat=True)[:10])}, 'jwt', False),
+            Endpoint('api:search', 'get', '/rest/search/', {'search': word}, 'jwt', False),
+            Endpoint('api:tags_suggest', 'get', '/rest/tags/suggest/',
+                     {'prefix': tag.tag_text[:3] if tag else 't'}, None, False),
+            Endpoint('api:trending', 'get', '/rest/trending/', {}, None, False),
+            Endpoint('api:help', 'get', '/rest/help/', {}, None, False),
+        ]
+
+    def request(self, endpoint):
+        """
+        :return: (status, time of request in seconds, number of queries)
+        """
+        headers = {}
+        if endpoint.auth == 'jwt':
+            headers['HTTP_AUTHORIZATION'] = 'JWT {}'.format(self.token)
+
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            with transaction.atomic():
+                response = getattr(self.client, endpoint.method)(
+                    endpoint.path, endpoint.params, **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                transaction.set_rollback(endpoint.write)
+            elapsed = time.perf_counter() - started
+
+        # Transaction itself is not counted
+        queries = [query for query in context.captured_queries
+                   if 'SAVEPOINT' not in query['sql']]
+        return response.status_code, elapsed, len(queries)
+
+    def run_endpoint(self, endpoint):
+        """
+        :return: Result of requests of endpoint
+        """
+        if endpoint.auth == 'session':
+            self.client.force_login(self.user)
+        else:
+            self.client.logout()
+
+        caches[CACHE].clear()
+        tag_index.invalidate()
+
+        statuses, times, queries = set(), [], []
+        for _ in range(self.repeat):
+            status, elapsed, number_of_queries = self.request(endpoint)
+            statuses.add(status)
+            times.append(elapsed)
+            queries.append(number_of_queries)
+
+        return Result(endpoint.name, endpoint.path, max(statuses), percentile(times, 50),
+                      percentile(times, 95), max(queries), get_budget(endpoint.name))
+
+    def run(self):
+        """
+        :return: list of Result for every endpoint
+        """
+        return [self.run_endpoint(endpoint) for endpoint in self.get_endpoints()]
+
+
+# ********************* FUNCTIONS ********************#
+
+def percentile(values, percent):
+    """
+    :return: value below which are percent of values (nearest rank)
+    """
+    values = sorted(values)
+    return values[max(0, -(-len(values) * percent // 100) - 1)]
+
+
+def get_budget(name):
+    """
+    :param name: name of URL pattern with namespace
+    :return: maximum number of queries of the view
+    """
+    return settings.BENCHMARK_QUERY_BUDGETS.get(name, settings.BENCHMARK_QUERY_BUDGET)
+
+
+def get_url_names():
+    """
+    :return: names of URL patterns of questions and api applications with namespace
+    """
+    from api import urls as api_urls
+    from questions import urls as questions_urls
+
+    return ['{}:{}'.format(urls.app_name, pattern.name)
+            for urls in (questions_urls, api_urls) for pattern in urls.urlpatterns
+            if isinstance(pattern, URLPattern)]
+
+
+def get_missing(endpoints):
+    """
+    :return: names of URL patterns which have no endpoint in the benchmark
+    """
+    names = {endpoint.name for endpoint in endpoints}
+    return [name for name in get_url_names() if name not in names]
+
+
+def get_failures(results):
+    """
+    :return: list of failure messages, views over budget and server errors
+    """
+    failures = []
+    for result in results:
+        if result.queries > result.budget:
+            failures.append('{}: {} queries, budget is {}'.format(
+                result.name, result.queries, result.budget))
+        if result.status >= 500:
+            failures.append('{}: status {}'.format(result.name, result.status))
+    return failures
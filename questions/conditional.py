@@ -0,0 +1,87 @@
+import hashlib
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from . import fragments, vote_buffer
+
+
+# ********************* FUNCTIONS ********************#
+
+def get_question_state(request, question_id):
+    """
+    :param request: HTTP request, state is kept in it for ETag and Last-Modified
+    :param question_id: id of a question
+    :return: (version, time of change) of the question or None if there is no question
+    """
+    if not hasattr(request, '_question_state'):
+        from .models import Question
+
+        try:
+            request._question_state = Question.objects.filter(
+                id=int(question_id)).values_list('version', 'updated_at').first()
+        except (TypeError, ValueError):
+            request._question_state = None
+
+    return request._question_state
+
+
+def get_question_etag(question_id, version, params=(), per_user=None):
+    """
+    :param question_id: id of a question
+    :param version: version of the question from the database
+    :param params: GET parameters of the request (page, batch, pretty...)
+    :param per_user: request if content depends on the user, None otherwise
+    :return: ETag of the question content
+
+    Version of answers (bumped by votes for answers) and version of profiles
+    (avatars of authors) are added. Buffered votes are not in the database
+    yet, so pending rating of the question is added too
+    """
+    parts = [question_id, version, sorted(params)]
+    parts.extend(fragments.get_versions([fragments.question_version(question_id),
+                                         fragments.PROFILES]))
+
+    if settings.VOTE_BUFFER:
+        parts.append(vote_buffer.get_pending('q', [int(question_id)]).get(int(question_id), 0))
+
+    # Page with forms has user and his or her CSRF token in it
+    if per_user is not None:
+        parts.extend([per_user.user.id, per_user.META.get('CSRF_COOKIE', '')])
+
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def question_condition(get_question_id, per_user=False):
+    """
+    :param get_question_id: function which returns id of a question from
+                            request and arguments of a view
+    :param per_user: content of the view depends on the user
+    :return: decorator of a view which answers 304 Not Modified if ETag or
+             Last-Modified of the question match the request, so view
+             is not called
+
+    ETag includes versions of fragments (e.g. avatars), so there is no
+    conditional GET if fragments are not cached (see fragments.is_enabled)
+    """
+
+    def etag(request, *args, **kwargs):
+        if not fragments.is_enabled():
+            return None
+        question_id = get_question_id(request, *args, **kwargs)
+        state = get_question_state(request, question_id)
+        if state is None:
+            return None
+        return get_question_etag(question_id, state[0], request.GET.lists(),
+                                 request if per_user else None)
+
+    def last_modified(request, *args, **kwargs):
+        if not fragments.is_enabled():
+            return None
+        state = get_question_state(request, get_question_id(request, *args, **kwargs))
+        # Page for user can change without change of the question
+        if state is None or per_user or settings.VOTE_BUFFER:
+            return None
+        return state[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,105 @@
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Answer, Question, VoteAnswer, VoteQuestion
+
+
+# ********************* FUNCTIONS ********************#
+
+def parse_since(value):
+    """
+    :param value: date or date and time in ISO format
+    :return: aware datetime
+    :raise ValueError: if value is not a date
+    """
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError('Incorrect date: {}'.format(value))
+        since = datetime.datetime.combine(date, datetime.time())
+
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def iter_questions(since, chunk_size):
+    """
+    :return: dicts of questions with their tags
+
+    Questions are taken by batches sorted by id, tags of every batch
+    are taken with one query, so memory does not grow with the table
+    """
+    questions = Question.objects.defer('search_vector').prefetch_related(
+        'question_tags').order_by('id')
+    if since is not None:
+        questions = questions.filter(updated_at__gte=since)
+
+    last_id = 0
+    while True:
+        batch = list(questions.filter(id__gt=last_id)[:chunk_size])
+        if not batch:
+            return
+
+        for question in batch:
+            yield {
+                'type': 'question',
+                'id': question.id,
+                'author_id': question.author_id,
+                'question_title': question.question_title,
+                'question_text': question.question_text,
+                'pub_date': question.pub_date,
+                'updated_at': question.updated_at,
+                'rating': question.rating,
+                'question_tags': [tag.tag_text for tag in question.question_tags.all()],
+            }
+        last_id = batch[-1].id
+
+
+def iter_values(queryset, record_type, chunk_size):
+    """
+    :return: dicts of rows of queryset read with server side cursor
+             (where database supports it)
+    """
+    for row in queryset.order_by('id').iterator(chunk_size=chunk_size):
+        row['type'] = record_type
+        yield row
+
+
+def iter_records(since=None, chunk_size=None):
+    """
+    :param since: export only questions changed since this time with their
+                  answers and votes (votes and answers change the question)
+    :param chunk_size: number of rows read from the database at once
+    :return: dicts of questions, answers and votes
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+
+    answers = Answer.objects.values(
+        'id', 'related_question_id', 'author_id', 'answer_text', 'pub_date', 'right', 'rating')
+    question_votes = VoteQuestion.objects.values('id', 'text_field_id', 'voter_id', 'up', 'down')
+    answer_votes = VoteAnswer.objects.values('id', 'text_field_id', 'voter_id', 'up', 'down')
+
+    if since is not None:
+        answers = answers.filter(related_question__updated_at__gte=since)
+        question_votes = question_votes.filter(text_field__updated_at__gte=since)
+        answer_votes = answer_votes.filter(text_field__related_question__updated_at__gte=since)
+
+    yield from iter_questions(since, chunk_size)
+    yield from iter_values(answers, 'answer', chunk_size)
+    yield from iter_values(question_votes, 'question_vote', chunk_size)
+    yield from iter_values(answer_votes, 'answer_vote', chunk_size)
+
+
+def iter_ndjson(since=None, chunk_size=None):
+    """
+    :return: lines of NDJSON with questions, answers and votes
+    """
+    for record in iter_records(since, chunk_size):
+        yield json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
@@ -0,0 +1,225 @@
+import functools
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+# ******************** CACHE KEYS ********************#
+VERSION_KEY = 'fragment:version:{name}'
+FRAGMENT_KEY = 'fragment:{view}:{digest}'
+PAGE_KEY = 'page:{digest}'
+
+# ******************** PAGE HOLES ********************#
+HOLE_TEMPLATE = 'questions/holes/{name}.html'
+HOLE_START = '<!--hole:{name}-->'
+HOLE_END = '<!--endhole:{name}-->'
+HOLE_RE = re.compile(r'<!--hole:(\w+)-->.*?<!--endhole:\1-->', re.DOTALL)
+
+# Versions of groups of fragments
+QUESTIONS = 'questions'
+PROFILES = 'profiles'
+
+
+# ********************* FUNCTIONS ********************#
+
+def get_cache():
+    """
+    :return: cache with rendered fragments and their versions
+    """
+    return caches[settings.FRAGMENT_CACHE]
+
+
+def is_enabled():
+    """
+    :return: True if fragments are cached. Versions are bumped by the process
+             which changed the data, so FRAGMENT_CACHE must be shared by all
+             processes (redis, memcached), it is None by default
+    """
+    return settings.FRAGMENT_CACHE is not None
+
+
+def question_version(question_id):
+    """
+    :return: name of version of fragments with answers to the question
+    """
+    return 'question:{}'.format(question_id)
+
+
+def new_version():
+    """
+    :return: initial version, it is taken from time, so if version is evicted
+             from the cache it does not match fragments rendered before
+    """
+    return int(time.time() * 1000)
+
+
+def get_versions(names):
+    """
+    :param names: names of versions
+    :return: list of current versions
+    """
+    cache = get_cache()
+    keys = [VERSION_KEY.format(name=name) for name in names]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            cache.add(key, new_version(), timeout=None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def bump(*names):
+    """
+    :param names: names of versions, fragments rendered with previous
+                  versions are not used any more
+    """
+    if not is_enabled():
+        return
+
+    cache = get_cache()
+    for name in names:
+        try:
+            cache.incr(VERSION_KEY.format(name=name))
+        except ValueError:
+            cache.set(VERSION_KEY.format(name=name), new_version(), timeout=None)
+
+
+def bump_on_commit(*names):
+    """
+    :param names: names of versions
+
+    Bump versions now and once more after commit, so fragment rendered by
+    concurrent request before the commit is not used either
+    """
+    if not is_enabled():
+        return
+
+    bump(*names)
+    transaction.on_commit(lambda: bump(*names))
+
+
+def cache_fragment(*names):
+    """
+    :param names: names of versions or functions which return name for a request
+    :return: decorator of a view which returns rendered fragment
+
+    Fragment is cached by view, GET parameters and versions, so cache hit
+    does not touch the database and the template engine. The key is also
+    ETag of the fragment, so client with the same fragment gets 304 Not Modified.
+    View is called every time if fragments are not cached (see is_enabled).
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_enabled():
+                return view(request, *args, **kwargs)
+
+            versions = get_versions([name(request) if callable(name) else name
+                                     for name in names])
+            digest = hashlib.md5(repr((sorted(request.GET.lists()), versions)).encode())
+            key = FRAGMENT_KEY.format(view=view.__name__, digest=digest.hexdigest())
+            etag = quote_etag(digest.hexdigest())
+
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            cache = get_cache()
+            content = cache.get(key)
+            if content is not None:
+                response = HttpResponse(content)
+            else:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.content, settings.FRAGMENT_CACHE_TIMEOUT)
+
+            response['ETag'] = etag
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def wrap_hole(name, content):
+    """
+    :param name: name of the hole
+    :param content: rendered template of the hole
+    :return: content between markers of the hole
+    """
+    return HOLE_START.format(name=name) + content + HOLE_END.format(name=name)
+
+
+def fill_holes(request, content):
+    """
+    :param request: HTTP request of authenticated user
+    :param content: page rendered for anonymous user
+    :return: page with user specific templates rendered in its holes
+    """
+    return HOLE_RE.sub(
+        lambda match: render_to_string(HOLE_TEMPLATE.format(name=match.group(1)),
+                                       request=request),
+        content.decode()).encode()
+
+
+def cache_page_shell(*names):
+    """
+    :param names: names of versions or functions which return name for
+                  request and arguments of the view
+    :return: decorator of a view which returns full page
+
+    Page is rendered for anonymous user and cached by path, GET parameters
+    and versions. Anonymous users get the cached page as it is, for
+    authenticated user only the holes of the page are rendered
+    (see templatetags/holes.py). View is called every time if fragments
+    are not cached (see is_enabled).
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not is_enabled():
+                return view(request, *args, **kwargs)
+
+            versions = get_versions([name(request, *args, **kwargs) if callable(name)
+                                     else name for name in names])
+            digest = hashlib.md5(repr(
+                (request.path, sorted(request.GET.lists()), versions)).encode())
+            key = PAGE_KEY.format(digest=digest.hexdigest())
+
+            cache = get_cache()
+            content = cache.get(key)
+            if content is None:
+                user, request.user = request.user, AnonymousUser()
+                try:
+                    response = view(request, *args, **kwargs)
+                    if hasattr(response, 'render') and callable(response.render):
+                        response = response.render()
+                finally:
+                    request.user = user
+
+                if response.status_code != 200:
+                    return response
+                content = response.content
+                cache.set(key, content, settings.PAGE_CACHE_TIMEOUT)
+
+            if request.user.is_authenticated:
+                content = fill_holes(request, content)
+
+            return HttpResponse(content)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,257 @@
+import csv
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from . import fragments, tag_index, trending
+from .models import get_hot_score, refresh_hot_scores, Answer, Question, Tag, \
+    UserProfile, VoteAnswer, VoteQuestion
+from .search import get_search_backend
+
+
+class Importer:
+    """
+    Bulk import of questions, answers and votes from records with type field
+    (the same records as export writes). Records are collected in buffers and
+    written with bulk_create, so there are a few queries for every batch:
+
+        question      -> id, author_id or author (username), question_title,
+                         question_text, pub_date, rating, question_tags
+                         (list or string with commas)
+        answer        -> id (optional), related_question_id, author_id or author,
+                         answer_text, pub_date, right, rating
+        question_vote -> text_field_id, voter_id or voter, up, down
+        answer_vote   -> text_field_id, voter_id or voter, up, down
+
+    Questions keep ids of the source, so answers and votes can refer to them.
+    Import stops if a question or an answer with the same id already exists,
+    otherwise tags, answers and votes would be attached to the existing one.
+    Ratings are imported as they are, votes do not change them.
+    """
+    models = {
+        'question': Question,
+        'answer': Answer,
+        'question_vote': VoteQuestion,
+        'answer_vote': VoteAnswer,
+    }
+
+    # Buffers are written in this order, so foreign keys exist
+    order = ('question', 'answer', 'question_vote', 'answer_vote')
+
+    def __init__(self, batch_size, report=None):
+        """
+        :param batch_size: number of records written with one query
+        :param report: function which gets number of imported records and
+                       records per second after every batch
+        """
+        self.batch_size = batch_size
+        self.report = report
+        self.buffers = {record_type: [] for record_type in self.order}
+        self.users = {}
+        self.imported = 0
+        self.started = time.monotonic()
+
+    def add(self, record):
+        """
+        :param record: dict with type field
+        :raise ValueError: if record has unknown type
+        """
+        record = dict(record)
+        record_type = record.pop('type', None)
+        if record_type not in self.buffers:
+            raise ValueError('Unknown type of record: {}'.format(record_type))
+
+        self.buffers[record_type].append(record)
+        if len(self.buffers[record_type]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffers to the database
+        """
+        imported = self.imported
+        with transaction.atomic():
+            self.resolve_users()
+            for record_type in self.order:
+                records, self.buffers[record_type] = self.buffers[record_type], []
+                if records:
+                    getattr(self, 'write_' + record_type + 's')(records)
+                    self.imported += len(records)
+
+        if self.report is not None and self.imported > imported:
+            self.report(self.imported, self.imported / (time.monotonic() - self.started))
+
+    def finish(self):
+        """
+        Write the rest of records and update data which is not written by
+        bulk_create: sequences of ids, profiles, hot scores, search index and caches
+        """
+        self.flush()
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(self.models.values())):
+                cursor.execute(sql)
+
+        UserProfile.create_missing_profiles(self.batch_size)
+        refresh_hot_scores(self.batch_size)
+        get_search_backend().rebuild()
+        trending.invalidate()
+        tag_index.invalidate()
+        fragments.bump(fragments.QUESTIONS, fragments.PROFILES)
+
+    # ******************** USERS ********************#
+
+    def resolve_users(self):
+        """
+        Find ids of users given by username in buffered records,
+        users which do not exist are created without password
+        """
+        usernames = {record[field] for records in self.buffers.values() for record in records
+                     for field in ('author', 'voter') if record.get(field)} - set(self.users)
+        if not usernames:
+            return
+
+        User.objects.bulk_create([User(username=username, password='!')
+                                  for username in usernames], ignore_conflicts=True)
+        self.users.update(User.objects.filter(username__in=usernames).values_list(
+            'username', 'id'))
+
+    def get_user_id(self, record, field):
+        """
+        :return: id of user from field_id or from username in field of record
+        """
+        if record.get(field + '_id') is not None:
+            return int(record[field + '_id'])
+        return self.users[record[field]]
+
+    @staticmethod
+    def get_value(model, record, field, default=None):
+        """
+        :return: value of field of record converted to python type of the model field
+        """
+        value = record.get(field)
+        if value is None or value == '':
+            return default
+        return model._meta.get_field(field).to_python(value)
+
+    # ******************** WRITERS ********************#
+
+    @staticmethod
+    def check_ids(model, ids):
+        """
+        :param model: Question or Answer
+        :param ids: ids of records
+        :raise ValueError: if objects with some of ids exist in the database
+        """
+        existing = sorted(model.objects.filter(id__in=ids).values_list('id', flat=True))
+        if existing:
+            raise ValueError('{} with ids {} already exist'.format(
+                model._meta.verbose_name_plural, ', '.join(map(str, existing[:10]))))
+
+    def write_questions(self, records):
+        """
+        Insert questions, then insert tags which do not exist and then
+        links of questions and tags, every step with one query
+        """
+        questions, tags = [], {}
+        for record in records:
+            question = Question(
+                id=int(record['id']),
+                author_id=self.get_user_id(record, 'author'),
+                question_title=record['question_title'],
+                question_text=record['question_text'],
+                pub_date=self.get_value(Question, record, 'pub_date'),
+                rating=self.get_value(Question, record, 'rating', 0))
+            question.hot_score = get_hot_score(question.rating, 0, question.pub_date)
+            question.updated_at = self.get_value(Question, record, 'updated_at',
+                                                 question.pub_date)
+            questions.append(question)
+
+            question_tags = record.get('question_tags') or ''
+            if not isinstance(question_tags, str):
+                question_tags = ','.join(question_tags)
+            tags[question.id] = Tag.normalize(question_tags)
+
+        self.check_ids(Question, tags)
+        Question.objects.bulk_create(questions)
+
+        tag_ids = {tag.tag_text: tag.id for tag in Tag.get_or_create_tags(
+            set().union(*tags.values()))}
+        QuestionTag = Question.question_tags.through
+        QuestionTag.objects.bulk_create(
+            [QuestionTag(question_id=question_id, tag_id=tag_ids[tag_text])
+             for question_id, tag_texts in tags.items() for tag_text in tag_texts],
+            ignore_conflicts=True)
+
+    def write_answers(self, records):
+        answers = [
+            Answer(id=self.get_value(Answer, record, 'id'),
+                   related_question_id=int(record['related_question_id']),
+                   author_id=self.get_user_id(record, 'author'),
+                   answer_text=record['answer_text'],
+                   pub_date=self.get_value(Answer, record, 'pub_date'),
+                   right=self.get_value(Answer, record, 'right', False),
+                   rating=self.get_value(Answer, record, 'rating', 0))
+            for record in records]
+
+        self.check_ids(Answer, [answer.id for answer in answers if answer.id is not None])
+        Answer.objects.bulk_create(answers)
+
+    def write_votes(self, model, records):
+        model.objects.bulk_create([
+            model(text_field_id=int(record['text_field_id']),
+                  voter_id=self.get_user_id(record, 'voter'),
+                  up=self.get_value(model, record, 'up', False),
+                  down=self.get_value(model, record, 'down', False))
+            for record in records], ignore_conflicts=True)
+
+    def write_question_votes(self, records):
+        self.write_votes(VoteQuestion, records)
+
+    def write_answer_votes(self, records):
+        self.write_votes(VoteAnswer, records)
+
+
+# ********************* FUNCTIONS ********************#
+
+def read_ndjson(lines):
+    """
+    :param lines: lines of NDJSON, empty lines are skipped
+    :return: dicts of records
+    """
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(lines):
+    """
+    :param lines: lines of CSV with header, tags are separated with commas
+    :return: dicts of records, empty cells are skipped
+    """
+    for row in csv.DictReader(lines):
+        yield {field: value for field, value in row.items() if value != ''}
+
+
+def drop_indexes():
+    """
+    Drop indexes of listings and answers, insert of many rows is faster
+    without them, they are created again by create_indexes
+    """
+    with connection.schema_editor() as schema_editor:
+        for model in (Question, Answer):
+            for index in model._meta.indexes:
+                schema_editor.remove_index(model, index)
+
+
+def create_indexes():
+    """
+    Create indexes dropped by drop_indexes
+    """
+    with connection.schema_editor() as schema_editor:
+        for model in (Question, Answer):
+            for index in model._meta.indexes:
+                schema_editor.add_index(model, index)
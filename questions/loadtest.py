@@ -0,0 +1,419 @@
+import collections
+import http.client
+import io
+import multiprocessing
+import random
+import sys
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.parse import urlencode, urlsplit
+from wsgiref.simple_server import make_server, WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import got_request_exception
+from django.db import connection, connections, OperationalError
+from django.test import Client
+from django.utils.crypto import get_random_string
+
+from . import benchmark, synthetic
+from .models import Question
+
+# Share of every action in traffic, see Visitor
+DEFAULT_MIX = 'index=40,question=30,vote=15,search=10,answer=5'
+
+# Number of the most popular questions which are requested
+QUESTIONS_LIMIT = 10000
+
+# Settings of load shared by all workers:
+#     url       -> URL of server or None to call WSGI application in process
+#     mix       -> list of (action, weight)
+#     questions -> ids of questions, the first are requested more often
+#     sessions  -> list of (session id, CSRF token) of logged in users
+LoadConfig = collections.namedtuple('LoadConfig', 'url mix questions sessions')
+
+# Result of one action:
+#     action   -> name of action
+#     requests -> number of HTTP requests of the action
+#     error    -> True if a request failed or returned status >= 400
+#     seconds  -> time of all requests of the action
+Sample = collections.namedtuple('Sample', 'action requests error seconds')
+
+_lock_errors = 0
+_lock_errors_lock = threading.Lock()
+
+
+class WSGITransport:
+    """
+    Calls WSGI application in process, without network and HTTP parsing
+    """
+
+    def __init__(self):
+        from hasker.wsgi import application
+        self.application = application
+
+    def request(self, method, path, params=None, data=None, headers=None):
+        """
+        :return: HTTP status of response
+        """
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(params or {}),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in (headers or {}).items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        statuses = []
+
+        def start_response(status, response_headers, exc_info=None):
+            statuses.append(status)
+            return lambda data: None
+
+        response = self.application(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+
+        return int(statuses[0].split()[0])
+
+
+class HTTPTransport:
+    """
+    Sends requests to a server over socket, every thread keeps its own connection
+    """
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.local = threading.local()
+
+    def request(self, method, path, params=None, data=None, headers=None):
+        """
+        :return: HTTP status of response, 0 if connection failed
+        """
+        if getattr(self.local, 'connection', None) is None:
+            self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+        headers = dict(headers or {})
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        if params:
+            path = '{}?{}'.format(path, urlencode(params))
+
+        try:
+            self.local.connection.request(method, path, body, headers)
+            response = self.local.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.local.connection.close()
+            self.local.connection = None
+            return 0
+
+
+class Visitor:
+    """
+    User of the site, every action is a few requests which browser sends:
+
+        index    -> listings by date and by rating and trending questions
+                    (AJAX calls of the index page)
+        question -> page of a question and the first page of its answers
+        vote     -> vote for a question
+        search   -> search by a word
+        answer   -> new answer to a question
+    """
+
+    def __init__(self, transport, config, rng):
+        self.transport = transport
+        self.config = config
+        self.rng = rng
+        self.actions, weights = zip(*config.mix)
+        self.action_weights = list(weights)
+        self.question_weights = synthetic.get_zipf_weights(len(config.questions), 1)
+
+        session_id, self.csrf_token = rng.choice(config.sessions)
+        self.headers = {'Cookie': '{}={}; {}={}'.format(
+            settings.SESSION_COOKIE_NAME, session_id, settings.CSRF_COOKIE_NAME, self.csrf_token)}
+
+    def get(self, path, params=None):
+        return self.transport.request('GET', path, params, headers=self.headers)
+
+    def get_question(self):
+        return self.rng.choices(self.config.questions, cum_weights=self.question_weights)[0]
+
+    def index(self):
+        return [self.get('/paginate_data/', {'data': 'd', 'cursor': ''}),
+                self.get('/paginate_data/', {'data': 't', 'cursor': ''}),
+                self.get('/trending_data/')]
+
+    def question(self):
+        question_id = self.get_question()
+        return [self.get('/question/{}/question.html'.format(question_id)),
+                self.get('/get_answers/', {'question_id': question_id, 'page': 1})]
+
+    def vote(self):
+        value = 'q {} 0 {}'.format(self.get_question(), self.rng.choice(('up', 'down')))
+        return [self.get('/vote/', {'value': value})]
+
+    def search(self):
+        return [self.get('/get_search/', {'search': self.rng.choice(synthetic.WORDS)})]
+
+    def answer(self):
+        data = {'Text': synthetic.get_text(self.rng, 20),
+                'csrfmiddlewaretoken': self.csrf_token}
+        return [self.transport.request(
+            'POST', '/question/{}/question.html'.format(self.get_question()),
+            data=data, headers=self.headers)]
+
+    def act(self):
+        """
+        :return: Sample of random action
+        """
+        action = self.rng.choices(self.actions, self.action_weights)[0]
+        started = time.perf_counter()
+        statuses = getattr(self, action)()
+        return Sample(action, len(statuses),
+                      any(status == 0 or status >= 400 for status in statuses),
+                      time.perf_counter() - started)
+
+
+class LockMonitor(threading.Thread):
+    """
+    Counts locks which queries wait for on PostgreSQL (pg_locks) every
+    interval seconds during the load and deadlocks found by the database
+    """
+
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.samples = 0
+        self.waiting_samples = 0
+        self.max_waiting = 0
+        self.deadlocks = None
+
+    @staticmethod
+    def is_supported():
+        return connection.vendor == 'postgresql'
+
+    @staticmethod
+    def get_deadlocks(cursor):
+        cursor.execute('SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()')
+        return cursor.fetchone()[0]
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                deadlocks = self.get_deadlocks(cursor)
+                while not self.stopped.wait(self.interval):
+                    cursor.execute('SELECT count(*) FROM pg_locks WHERE NOT granted')
+                    waiting = cursor.fetchone()[0]
+                    self.samples += 1
+                    self.waiting_samples += waiting > 0
+                    self.max_waiting = max(self.max_waiting, waiting)
+                self.deadlocks = self.get_deadlocks(cursor) - deadlocks
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+# ********************* FUNCTIONS ********************#
+
+def parse_mix(value):
+    """
+    :param value: actions with weights, e.g. index=40,question=30
+    :return: list of (action, weight)
+    :raise ValueError: if action is unknown or weight is not a number
+    """
+    mix = []
+    for part in value.split(','):
+        action, _, weight = part.partition('=')
+        action = action.strip()
+        if action not in ('index', 'question', 'vote', 'search', 'answer'):
+            raise ValueError('Unknown action: {}'.format(action))
+        mix.append((action, float(weight)))
+    return mix
+
+
+def get_sessions(number):
+    """
+    :param number: number of users
+    :return: list of (session id, CSRF token) of logged in users
+    :raise ValueError: if there are no users in the database
+    """
+    sessions = []
+    for user in User.objects.filter(is_active=True).order_by('id')[:number]:
+        client = Client()
+        client.force_login(user)
+        sessions.append((client.cookies[settings.SESSION_COOKIE_NAME].value,
+                         get_random_string(32)))
+
+    if not sessions:
+        raise ValueError('There are no users in the database, run seed_synthetic')
+    return sessions
+
+
+def get_config(url, mix, users):
+    """
+    :return: LoadConfig with popular questions and sessions of users
+    :raise ValueError: if there is no data for the load
+    """
+    questions = list(Question.objects.order_by('-hot_score', '-id').values_list(
+        'id', flat=True)[:QUESTIONS_LIMIT])
+    if not questions:
+        raise ValueError('There are no questions in the database, run seed_synthetic')
+    return LoadConfig(url, parse_mix(mix), questions, get_sessions(users))
+
+
+def count_lock_error(sender, **kwargs):
+    """
+    Count exceptions of views caused by locks of the database
+    (database is locked, lock timeout, deadlock)
+    """
+    global _lock_errors
+
+    error = sys.exc_info()[1]
+    if isinstance(error, OperationalError) and 'lock' in str(error).lower():
+        with _lock_errors_lock:
+            _lock_errors += 1
+
+
+def get_lock_errors():
+    """
+    :return: number of lock errors of views in this process
+    """
+    return _lock_errors
+
+
+def run_worker(visitor, deadline):
+    """
+    :return: list of Sample of actions done until deadline
+    """
+    samples = []
+    while time.monotonic() < deadline:
+        samples.append(visitor.act())
+    return samples
+
+
+def run_process(config, threads, seed, duration):
+    """
+    :return: (list of Sample, number of lock errors) of threads of one process
+    """
+    transport = HTTPTransport(config.url) if config.url else WSGITransport()
+    visitors = [Visitor(transport, config, random.Random(seed * 1000 + number))
+                for number in range(threads)]
+    deadline = time.monotonic() + duration
+
+    # Errors are counted where application runs, see serve for server
+    lock_errors = get_lock_errors()
+    if config.url is None:
+        got_request_exception.connect(count_lock_error)
+    try:
+        if threads == 1:
+            samples = run_worker(visitors[0], deadline)
+        else:
+            with ThreadPoolExecutor(threads) as executor:
+                results = executor.map(lambda visitor: run_worker(visitor, deadline), visitors)
+                samples = [sample for result in results for sample in result]
+    finally:
+        got_request_exception.disconnect(count_lock_error)
+
+    return samples, get_lock_errors() - lock_errors if config.url is None else 0
+
+
+def run(config, processes, threads, duration, seed=0):
+    """
+    :param config: LoadConfig
+    :param processes: number of processes, each of them has its own
+                      WSGI application (or connections to the server)
+    :param threads: number of threads in every process
+    :param duration: seconds of load
+    :return: (list of Sample, number of lock errors, LockMonitor or None)
+    """
+    monitor = LockMonitor() if LockMonitor.is_supported() else None
+    if monitor is not None:
+        monitor.start()
+
+    try:
+        if processes == 1:
+            samples, lock_errors = run_process(config, threads, seed, duration)
+        else:
+            # Children get copies of connections, so they are closed before fork
+            connections.close_all()
+            with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context(
+                    'fork')) as executor:
+                futures = [executor.submit(run_process, config, threads, seed + number,
+                                           duration) for number in range(processes)]
+                results = [future.result() for future in futures]
+            samples = [sample for result in results for sample in result[0]]
+            lock_errors = sum(result[1] for result in results)
+    finally:
+        if monitor is not None:
+            monitor.stop()
+
+    return samples, lock_errors, monitor
+
+
+def serve():
+    """
+    Start threaded server of the WSGI application on free port of localhost,
+    its lock errors are counted in this process (see get_lock_errors)
+    :return: (server, URL of the server)
+    """
+    from hasker.wsgi import application
+
+    server = make_server('127.0.0.1', 0, application, server_class=ThreadingWSGIServer,
+                         handler_class=QuietWSGIRequestHandler)
+    got_request_exception.connect(count_lock_error)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_port)
+
+
+def get_statistics(samples):
+    """
+    :return: list of (action, number, errors, p50, p95, p99, max) sorted by action
+    """
+    groups = collections.defaultdict(list)
+    for sample in samples:
+        groups[sample.action].append(sample)
+
+    return [(action, len(group), sum(sample.error for sample in group),
+             *(benchmark.percentile([sample.seconds for sample in group], percent)
+               for percent in (50, 95, 99, 100)))
+            for action, group in sorted(groups.items())]
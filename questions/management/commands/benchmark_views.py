@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Request every URL of questions and api applications, report median and
+    95th percentile of time and number of SQL queries of every view and fail
+    if a view is over its query budget (settings.BENCHMARK_QUERY_BUDGETS)
+    """
+    help = 'Measure latency and SQL queries of every view against query budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='number of requests of every URL')
+
+    def handle(self, *args, **options):
+        with benchmark.Benchmark(options['repeat']) as runner:
+            try:
+                endpoints = runner.get_endpoints()
+            except ValueError as error:
+                raise CommandError(error)
+
+            missing = benchmark.get_missing(endpoints)
+            if missing:
+                raise CommandError('URLs without benchmark: {}'.format(', '.join(missing)))
+
+            self.stdout.write('{:<26} {:>6} {:>9} {:>9} {:>8} {:>7}'.format(
+                'view', 'status', 'p50 ms', 'p95 ms', 'queries', 'budget'))
+
+            results = []
+            for endpoint in endpoints:
+                result = runner.run_endpoint(endpoint)
+                results.append(result)
+                self.stdout.write('{:<26} {:>6} {:>9.1f} {:>9.1f} {:>8} {:>7}'.format(
+                    result.name, result.status, result.p50 * 1000, result.p95 * 1000,
+                    result.queries, result.budget))
+
+        failures = benchmark.get_failures(results)
+        if failures:
+            raise CommandError('\n'.join(failures))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions.models import UserProfile
+
+
+class Command(BaseCommand):
+    """
+    Create profiles of users who have none (registered before profiles
+    were created at signup)
+    """
+    help = 'Create missing profiles of users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=settings.CREATE_PROFILES_BATCH,
+                            help='number of profiles created with one query')
+
+    def handle(self, *args, **options):
+        created = UserProfile.create_missing_profiles(options['batch'])
+        self.stdout.write('Created {} profiles'.format(created))
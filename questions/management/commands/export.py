@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import export
+
+
+class Command(BaseCommand):
+    """
+    Export questions with tags, answers and votes as NDJSON
+    (one JSON object with type field on every line)
+    """
+    help = 'Export questions, answers and votes as NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', default=None,
+                            help='export only questions changed since the date '
+                                 '(ISO format) with their answers and votes')
+        parser.add_argument('--output', default=None,
+                            help='file to write, standard output by default')
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                            help='number of rows read from the database at once')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = export.parse_since(options['since'])
+            except ValueError as error:
+                raise CommandError(error)
+
+        lines = export.iter_ndjson(since, options['chunk_size'])
+
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w') as output:
+            output.writelines(lines)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import vote_buffer
+
+
+class Command(BaseCommand):
+    """
+    Flush ratings accumulated in the vote buffer to the database.
+    Buffer cache should be shared between processes (file, redis, memcached).
+    """
+    help = 'Flush ratings accumulated in the vote buffer to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='check pending ratings of all questions and answers')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='flush every INTERVAL seconds until interrupted')
+
+    def handle(self, *args, **options):
+        flush = vote_buffer.flush_all if options['all'] else vote_buffer.flush
+
+        while True:
+            try:
+                updated = flush()
+            except RuntimeError as error:
+                raise CommandError(error)
+            self.stdout.write('Flushed ratings of {} objects'.format(updated))
+
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,71 @@
+import os
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import importer
+
+
+class Command(BaseCommand):
+    """
+    Import questions with tags, answers and votes from NDJSON (as written
+    by export) or CSV with type column. Records are written in batches
+    with bulk_create, indexes of listings can be dropped during import.
+    """
+    help = 'Import questions, answers and votes from NDJSON or CSV'
+
+    readers = {
+        'ndjson': importer.read_ndjson,
+        'csv': importer.read_csv,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+',
+                            help='files to read, - for standard input')
+        parser.add_argument('--format', choices=sorted(self.readers), default=None,
+                            help='format of files, by extension of file by default')
+        parser.add_argument('--batch', type=int, default=settings.IMPORT_BATCH,
+                            help='number of records written with one query')
+        parser.add_argument('--defer-indexes', action='store_true',
+                            help='drop indexes of questions and answers during import '
+                                 'and create them after it')
+
+    def report(self, imported, speed):
+        self.stdout.write('Imported {} records ({:.0f} records/s)'.format(imported, speed))
+
+    def get_reader(self, path, file_format):
+        if file_format is None:
+            file_format = 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'ndjson'
+        return self.readers[file_format]
+
+    def handle(self, *args, **options):
+        qa_importer = importer.Importer(options['batch'], self.report)
+
+        if options['defer_indexes']:
+            importer.drop_indexes()
+
+        try:
+            for path in options['files']:
+                reader = self.get_reader(path, options['format'])
+                source = sys.stdin if path == '-' else open(path, newline='')
+                number = 0
+                try:
+                    for number, record in enumerate(reader(source), 1):
+                        qa_importer.add(record)
+                except (ValueError, KeyError) as error:
+                    raise CommandError('{}, after record {}: {!r}'.format(path, number, error))
+                finally:
+                    if source is not sys.stdin:
+                        source.close()
+
+            try:
+                qa_importer.finish()
+            except ValueError as error:
+                raise CommandError(error)
+        finally:
+            if options['defer_indexes']:
+                self.stdout.write('Creating indexes')
+                importer.create_indexes()
+
+        self.stdout.write('Imported {} records'.format(qa_importer.imported))
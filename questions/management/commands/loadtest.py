@@ -0,0 +1,83 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import loadtest
+
+
+class Command(BaseCommand):
+    """
+    Load the site with mix of actions of users (index, question pages, votes,
+    searches, answers) from processes and threads, report throughput, tail
+    latency of every action and waits for locks of the database.
+    Votes and answers are written to the database, use it with test data.
+    """
+    help = 'Load the site with realistic traffic and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help='URL of running server (e.g. gunicorn), WSGI '
+                                 'application is called in process by default')
+        parser.add_argument('--serve', action='store_true',
+                            help='start threaded server of the application on local '
+                                 'socket and load it')
+        parser.add_argument('--processes', type=int, default=1,
+                            help='number of processes')
+        parser.add_argument('--threads', type=int, default=4,
+                            help='number of threads in every process')
+        parser.add_argument('--duration', type=float, default=30,
+                            help='seconds of load')
+        parser.add_argument('--mix', default=loadtest.DEFAULT_MIX,
+                            help='weights of actions: index, question, vote, search, answer')
+        parser.add_argument('--users', type=int, default=50,
+                            help='number of users logged in for the load')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='seed of random numbers')
+
+    def handle(self, *args, **options):
+        if options['url'] and options['serve']:
+            raise CommandError('--url and --serve can not be used together')
+
+        server, url = None, options['url']
+        if options['serve']:
+            server, url = loadtest.serve()
+
+        try:
+            config = loadtest.get_config(url, options['mix'], options['users'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        self.stdout.write('Load of {} for {} s: {} processes x {} threads'.format(
+            url or 'WSGI application in process', options['duration'],
+            options['processes'], options['threads']))
+
+        server_lock_errors = loadtest.get_lock_errors()
+        started = time.monotonic()
+        try:
+            samples, lock_errors, monitor = loadtest.run(
+                config, options['processes'], options['threads'], options['duration'],
+                options['seed'])
+        finally:
+            if server is not None:
+                server.shutdown()
+        elapsed = time.monotonic() - started
+        lock_errors += loadtest.get_lock_errors() - server_lock_errors
+
+        requests = sum(sample.requests for sample in samples)
+        self.stdout.write('Requests: {} ({:.1f} requests/s), actions: {} ({:.1f} actions/s)'
+                          .format(requests, requests / elapsed, len(samples),
+                                  len(samples) / elapsed))
+
+        self.stdout.write('{:<10} {:>7} {:>7} {:>9} {:>9} {:>9} {:>9}'.format(
+            'action', 'number', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+        for action, number, errors, *times in loadtest.get_statistics(samples):
+            self.stdout.write('{:<10} {:>7} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}'.format(
+                action, number, errors, *(seconds * 1000 for seconds in times)))
+
+        # Views of other server can not be seen from here
+        if not options['url']:
+            self.stdout.write('Errors of views caused by locks: {}'.format(lock_errors))
+        if monitor is not None:
+            self.stdout.write('Lock waits: {} of {} samples, at most {} waiting, '
+                              '{} deadlocks'.format(monitor.waiting_samples, monitor.samples,
+                                                    monitor.max_waiting, monitor.deadlocks))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from questions.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Index all questions with the search backend from scratch
+    """
+    help = 'Index all questions with the search backend from scratch'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write('Search index is rebuilt with {}'.format(type(backend).__name__))
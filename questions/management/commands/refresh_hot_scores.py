@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions.models import refresh_hot_scores
+
+
+class Command(BaseCommand):
+    """
+    Recalculate hot score of all questions in batches
+    """
+    help = 'Recalculate hot score of all questions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=settings.HOT_SCORE_BATCH,
+                            help='number of questions updated with one query')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='refresh every INTERVAL seconds until interrupted')
+
+    def handle(self, *args, **options):
+        while True:
+            updated = refresh_hot_scores(options['batch'])
+            self.stdout.write('Hot score of {} questions is refreshed'.format(updated))
+
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
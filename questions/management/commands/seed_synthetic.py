@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions import importer, synthetic
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with generated users, questions with tags (popularity
+    of tags follows Zipf distribution), answers and votes for benchmarks
+    """
+    help = 'Generate users, questions, answers and votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help='number of users')
+        parser.add_argument('--questions', type=int, default=1000,
+                            help='number of questions')
+        parser.add_argument('--answers', type=float, default=3,
+                            help='mean number of answers to a question')
+        parser.add_argument('--votes', type=float, default=5,
+                            help='mean number of votes for a question or an answer')
+        parser.add_argument('--tags', type=int, default=200,
+                            help='number of tags')
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='exponent of Zipf distribution of tags')
+        parser.add_argument('--days', type=int, default=365,
+                            help='questions are published during this number of days')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='seed of random numbers')
+        parser.add_argument('--batch', type=int, default=settings.IMPORT_BATCH,
+                            help='number of records written with one query')
+
+    def report(self, imported, speed):
+        self.stdout.write('Written {} records ({:.0f} records/s)'.format(imported, speed))
+
+    def handle(self, *args, **options):
+        qa_importer = importer.Importer(options['batch'], self.report)
+
+        for record in synthetic.iter_records(
+                users=options['users'], questions=options['questions'],
+                answers=options['answers'], votes=options['votes'], tags=options['tags'],
+                exponent=options['zipf'], days=options['days'], seed=options['seed']):
+            qa_importer.add(record)
+
+        qa_importer.finish()
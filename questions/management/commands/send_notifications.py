@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from questions import notifications
+
+
+class Command(BaseCommand):
+    """
+    Worker sends queued email notifications about new answers.
+    Several workers can run at the same time.
+    """
+    help = 'Send queued email notifications about new answers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=settings.NOTIFICATION_BATCH,
+                            help='number of notifications claimed at once')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='check queue every INTERVAL seconds until interrupted')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='return failed notifications to the queue first')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write('{} failed notifications are queued again'.format(
+                notifications.retry_failed()))
+
+        while True:
+            sent, failed = notifications.send_notifications(options['batch'])
+            self.stdout.write('Sent {} notifications, {} failed'.format(sent, failed))
+
+            # Queue is drained without pause
+            if sent or failed:
+                continue
+            if options['interval'] is None:
+                break
+            time.sleep(options['interval'])
+            close_old_connections()
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from hasker import slow_queries
+from questions import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Summary of the slow query log: queries grouped by text, place in
+    the project or view and sorted by total time
+    """
+    help = 'Summarize the slow query log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None,
+                            help='log to read, settings.SLOW_QUERY_LOG by default')
+        parser.add_argument('--by', choices=('sql', 'frame', 'view'), default='sql',
+                            help='field to group queries by')
+        parser.add_argument('--slow-only', action='store_true',
+                            help='skip sampled queries which are not slow')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='number of groups to show')
+
+    def handle(self, *args, **options):
+        groups = {}
+        for entry in slow_queries.iter_entries(options['log']):
+            if options['slow_only'] and not entry['slow']:
+                continue
+            group = groups.setdefault(entry[options['by']], {'durations': [], 'places': set()})
+            group['durations'].append(entry['duration'])
+            group['places'].add('{} {}'.format(entry['view'], entry['frame']))
+
+        if not groups:
+            self.stdout.write('There are no queries in the log')
+            return
+
+        self.stdout.write('{:>6} {:>10} {:>9} {:>9} {:>9}  {}'.format(
+            'count', 'total ms', 'mean ms', 'p95 ms', 'max ms', options['by']))
+
+        groups = sorted(groups.items(), key=lambda item: -sum(item[1]['durations']))
+        for key, group in groups[:options['limit']]:
+            durations = group['durations']
+            self.stdout.write('{:>6} {:>10.1f} {:>9.1f} {:>9.1f} {:>9.1f}  {}'.format(
+                len(durations), sum(durations) * 1000, sum(durations) / len(durations) * 1000,
+                benchmark.percentile(durations, 95) * 1000, max(durations) * 1000, key))
+            if options['by'] == 'sql':
+                for place in sorted(group['places']):
+                    self.stdout.write(' ' * 50 + place)
@@ -0,0 +1,50 @@
+# Generated by Django 3.1.6 on 2026-10-18 04:20
+
+from django.db import migrations, models
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    """
+    Keep only the first vote of each user for each question and answer and
+    recalculate rating of voted objects from remaining votes
+    """
+    for model_name, object_name in (('VoteQuestion', 'Question'), ('VoteAnswer', 'Answer')):
+        vote_class = apps.get_model('questions', model_name)
+        object_class = apps.get_model('questions', object_name)
+        duplicates = vote_class.objects.values('voter', 'text_field').annotate(
+            first_id=models.Min('id'), votes=models.Count('id')).filter(votes__gt=1)
+
+        object_ids = set()
+        for duplicate in duplicates:
+            vote_class.objects.filter(
+                voter=duplicate['voter'], text_field=duplicate['text_field']
+            ).exclude(id=duplicate['first_id']).delete()
+            object_ids.add(duplicate['text_field'])
+
+        ratings = vote_class.objects.filter(text_field__in=object_ids).values(
+            'text_field').annotate(
+            up_votes=models.Count('id', filter=models.Q(up=True)),
+            down_votes=models.Count('id', filter=models.Q(down=True)))
+
+        for rating in ratings:
+            object_class.objects.filter(id=rating['text_field']).update(
+                rating=rating['up_votes'] - rating['down_votes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='voteanswer',
+            constraint=models.UniqueConstraint(fields=('voter', 'text_field'), name='unique_answer_vote'),
+        ),
+        migrations.AddConstraint(
+            model_name='votequestion',
+            constraint=models.UniqueConstraint(fields=('voter', 'text_field'), name='unique_question_vote'),
+        ),
+    ]
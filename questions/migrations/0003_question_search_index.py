@@ -0,0 +1,66 @@
+# Generated by Django 3.1.6 on 2026-10-18 05:02
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# Index of search_vector which is used by PostgresSearchBackend
+SEARCH_INDEX = GinIndex(fields=['search_vector'], name='question_search_vector_gin')
+
+
+def create_search_index(apps, schema_editor):
+    """
+    PostgreSQL -> fill search_vector with settings.SEARCH_CONFIG as
+                  PostgresSearchBackend does and create GIN index on it
+    SQLite     -> create FTS5 table with title and text of every question
+    """
+    connection = schema_editor.connection
+
+    if connection.vendor == 'postgresql':
+        question_class = apps.get_model('questions', 'Question')
+        question_class.objects.update(search_vector=(
+            SearchVector('question_title', weight='A', config=settings.SEARCH_CONFIG) +
+            SearchVector('question_text', weight='B', config=settings.SEARCH_CONFIG)))
+        schema_editor.add_index(question_class, SEARCH_INDEX)
+
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE questions_question_fts "
+                    "USING fts5(question_title, question_text)")
+            except Exception:
+                # SQLite is built without FTS5, icontains search is used
+                return
+
+            cursor.execute(
+                "INSERT INTO questions_question_fts (rowid, question_title, question_text) "
+                "SELECT id, question_title, question_text FROM questions_question")
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+
+    if connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('questions', 'Question'), SEARCH_INDEX)
+
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS questions_question_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0002_vote_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
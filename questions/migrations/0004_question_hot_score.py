@@ -0,0 +1,47 @@
+# Generated by Django 3.1.6 on 2026-10-18 04:30
+
+import datetime
+import math
+
+from django.db import migrations, models
+
+HOT_SCORE_EPOCH = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def fill_hot_score(apps, schema_editor):
+    """
+    Calculate hot score of existing questions as questions.models.get_hot_score does
+    """
+    question_class = apps.get_model('questions', 'Question')
+    questions = question_class.objects.annotate(
+        number_of_answers=models.Count('answer')).order_by('id')
+
+    batch = []
+    for question in questions.iterator(chunk_size=1000):
+        score = question.rating + 2 * question.number_of_answers
+        sign = (score > 0) - (score < 0)
+        question.hot_score = sign * math.log10(max(abs(score), 1)) + \
+            (question.pub_date - HOT_SCORE_EPOCH).total_seconds() / 45000
+        batch.append(question)
+
+        if len(batch) == 1000:
+            question_class.objects.bulk_update(batch, ['hot_score'])
+            batch = []
+
+    question_class.objects.bulk_update(batch, ['hot_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0003_question_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='hot_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(fill_hot_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.1.6 on 2026-10-18 04:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0005_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('p', 'pending'), ('r', 'running'), ('f', 'failed')], default='p', max_length=1)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('claimed_by', models.CharField(blank=True, default='', max_length=32)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='questions.answer')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='answernotification',
+            index=models.Index(fields=['status', 'run_after'], name='notification_claim_idx'),
+        ),
+    ]
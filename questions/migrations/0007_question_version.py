@@ -0,0 +1,24 @@
+# Generated by Django 3.1.6 on 2026-10-18 04:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0006_answer_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='date updated'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,15 +1,21 @@
 import datetime
+import math
 
 from urllib.parse import quote
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.core.paginator import Paginator
-from django.core.mail import EmailMultiAlternatives
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Abs, Cast, Coalesce, Greatest, Log, Now, Sign
 from django.urls import reverse
 from django.utils import timezone
 
+from . import fragments, trending, vote_buffer
+from .pagination import CursorPaginator
+from .search import get_search_backend
+
 # ****************** TEMPLATE EMAIL ******************#
 email_template = "<p>You get a new answer to your question:</p> " \
                  "<p><b>{question_text}</p></b><br>" \
@@ -17,6 +23,17 @@ email_template = "<p>You get a new answer to your question:</p> " \
                  "<p><a><i>{link}</i></a></p><br>" \
                  "<p>Hasker©</p><br>"
 
+digest_template = "<p>You get {number} new answers to your questions:</p> " \
+                  "{answers}" \
+                  "<p>Hasker©</p><br>"
+
+digest_answer_template = "<p><b>{question_title}</b></p>" \
+                         "<p>{answer_text}</p>" \
+                         "<p><a><i>{link}</i></a></p><br>"
+
+# ******************** HOT SCORE *********************#
+HOT_SCORE_EPOCH = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+
 
 # ********************* CLASSES **********************#
 
@@ -33,12 +50,38 @@ class UserProfile(models.Model):
     def get_profile(user_id):
         """
         :param user_id:
-        :return: user profile for given user id
+        :return: user profile for given user id or None if there is no profile
+
+        Profile is created together with the user (see signals), so reading
+        a profile never writes to the database
         """
-        try:
-            return UserProfile.objects.get(user_id=user_id)
-        except UserProfile.DoesNotExist:
-            return UserProfile.objects.create(user_id=user_id)
+        return UserProfile.objects.select_related('user').filter(user_id=user_id).first()
+
+    @staticmethod
+    def create_missing_profiles(batch_size):
+        """
+        :param batch_size: number of profiles created with one query
+        :return: number of created profiles
+
+        Create profiles of users registered before profiles were created at signup.
+        Profiles created concurrently (e.g. at signup) are skipped by the insert,
+        so created profiles are counted in the database
+        """
+        created = 0
+        user_ids = User.objects.filter(userprofile__isnull=True).values_list(
+            'id', flat=True).order_by('id')
+
+        while True:
+            batch = list(user_ids[:batch_size])
+            if not batch:
+                return created
+
+            profiles = UserProfile.objects.filter(user_id__in=batch)
+            existing = profiles.count()
+            UserProfile.objects.bulk_create(
+                [UserProfile(user_id=user_id) for user_id in batch],
+                ignore_conflicts=True)
+            created += profiles.count() - existing
 
     def update_profile(self, email, avatar):
         """
@@ -66,6 +109,34 @@ class Tag(models.Model):
     def __str__(self):
         return self.tag_text
 
+    @staticmethod
+    def normalize(tags):
+        """
+        :param tags: tags separated with commas
+        :return: set of tags without surrounding and repeated spaces,
+                 cut to the maximum length of a tag
+        """
+        max_length = Tag._meta.get_field('tag_text').max_length
+        tags = (' '.join(tag.split())[:max_length].strip() for tag in tags.split(','))
+        return {tag for tag in tags if tag}
+
+    @staticmethod
+    def get_or_create_tags(tag_texts):
+        """
+        :param tag_texts: normalized texts of tags
+        :return: list of Tag instances, not existing tags are created
+
+        New tags are inserted with one query, tags created concurrently
+        by another user are ignored by unique constraint and then
+        all tags are selected with one query
+        """
+        if not tag_texts:
+            return []
+
+        Tag.objects.bulk_create([Tag(tag_text=tag_text) for tag_text in tag_texts],
+                                ignore_conflicts=True)
+        return list(Tag.objects.filter(tag_text__in=tag_texts))
+
 
 class Question(models.Model):
     """
@@ -86,16 +157,78 @@ class Question(models.Model):
 
     rating = models.IntegerField(null=False, blank=False, default=0)
 
+    # Rating weighted by age of the question, see get_hot_score
+    hot_score = models.FloatField(null=False, blank=False, default=0)
+
+    # Full text search index of title and text (used only on PostgreSQL)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Changed with answers, votes and right answer, see get_change_update
+    version = models.PositiveIntegerField(null=False, blank=False, default=0)
+    updated_at = models.DateTimeField('date updated', default=timezone.now)
+
+    class Meta:
+        # Listings are sorted by (field, id), see get_listing_page
+        indexes = [
+            models.Index(fields=('rating', 'id'), name='question_rating_idx'),
+            models.Index(fields=('pub_date', 'id'), name='question_pub_date_idx'),
+            models.Index(fields=('hot_score', 'id'), name='question_hot_score_idx'),
+        ]
+
     def __str__(self):
         return self.question_title
 
+    @staticmethod
+    def get_listing_queryset(*order_by):
+        """
+        :param order_by: fields to sort questions by
+        :return: questions with annotated number of answers, selected authors
+                 with their profiles and prefetched tags, so a page of listing
+                 is rendered with a constant number of queries
+        """
+        return Question.objects.defer('search_vector').select_related(
+            'author', 'author__userprofile'
+        ).prefetch_related(
+            'question_tags'
+        ).annotate(
+            number_of_answers=get_number_of_answers()
+        ).order_by(*order_by)
+
+    @staticmethod
+    def get_listing_page(request, batch):
+        """
+        :param request: HTTP request with data and cursor or page parameters
+            data == 'd' --> sort by date
+            data == 't' --> sort by rating
+            data == 'h' --> sort by hot score
+        :param batch: number of questions on one page
+        :return: page of questions and its number (None for cursor pages)
+
+        Offset pages are used by default, cursor pages are used if cursor
+        is given (empty cursor -> the first page)
+        """
+        by = {'d': 'pub_date', 'h': 'hot_score'}.get(request.GET.get('data', 't'), 'rating')
+        questions = Question.get_listing_queryset()
+
+        if 'cursor' in request.GET:
+            paginator = CursorPaginator(questions, by, batch)
+            questions = paginator.get_page(request.GET.get('cursor'))
+            page = None
+        else:
+            paginator = Paginator(questions.order_by('-' + by, '-id'), batch)
+            questions = paginator.get_page(request.GET.get('page'))
+            page = questions.number
+
+        questions.object_list = vote_buffer.merge_pending('q', questions.object_list)
+        return questions, page
+
     @staticmethod
     def get_trending_question():
         """
-        :return: settings.TRENDING_BATCH most voted questions
+        :return: settings.TRENDING_BATCH most voted questions from the cache,
+                 only id, title and rating of the questions are available
         """
-        question_list = Question.objects.order_by('-rating').all()
-        return question_list[:settings.TRENDING_BATCH]
+        return trending.get_trending()
 
     @staticmethod
     def create_question(request):
@@ -106,6 +239,8 @@ class Question(models.Model):
         atomic transaction -> create new_question
                            -> create tags if they are not exists
                            -> add all tags to the Question instance
+
+        Number of queries does not depend on number of tags
         """
         with transaction.atomic():
 
@@ -116,20 +251,12 @@ class Question(models.Model):
                 pub_date=timezone.now()
             )
 
-            # Get all tags from request
-            tags = set([tag.strip() for tag in
-                        request.POST.get("tags").split(",")])
-
             # Save not existing tags and add all tags to new question
-            for tag_text in tags:
-                if tag_text:
-                    try:
-                        tag = Tag.objects.get(tag_text=tag_text)
-                    except Tag.DoesNotExist:
-                        tag = Tag.objects.create(tag_text=tag_text)
-                    new_question.question_tags.add(tag)
+            tags = Tag.get_or_create_tags(Tag.normalize(request.POST.get("tags", "")))
 
-            new_question.save()
+            QuestionTag = Question.question_tags.through
+            QuestionTag.objects.bulk_create(
+                [QuestionTag(question_id=new_question.id, tag_id=tag.id) for tag in tags])
 
             return new_question
 
@@ -140,7 +267,7 @@ class Question(models.Model):
         :param search_query: query in string format
         :return: questions found by search query and page of Paginator
         """
-        questions = Question.objects.all()
+        questions = Question.get_listing_queryset()
         page = request.GET.get('page', 1)
         batch = request.GET.get('batch', settings.SEARCH_BATCH)
 
@@ -149,21 +276,20 @@ class Question(models.Model):
             search_query = search_query[0].split(':')[1]
             try:
                 tag = Tag.objects.get(tag_text=search_query).id
-                questions = questions.filter(question_tags=tag)
+                questions = questions.filter(question_tags=tag).order_by(
+                    '-rating', '-pub_date')
             except Tag.DoesNotExist:
                 questions = None
 
         # Handle simple search query
         else:
-            for word in search_query:
-                questions = questions.filter(models.Q(question_title__icontains=word) |
-                                             models.Q(question_text__icontains=word))
+            questions = get_search_backend().search(questions, search_query)
 
         # Create paginator if there are found questions
-        if questions:
-            questions = questions.order_by('-rating', '-pub_date')
+        if questions is not None:
             paginator = Paginator(questions, batch)
             questions = paginator.get_page(page)
+            questions.object_list = vote_buffer.merge_pending('q', questions.object_list)
 
         return questions, questions.number if questions else page
 
@@ -204,6 +330,9 @@ class Question(models.Model):
                 answer.right = not is_right
                 answer.save()
 
+                Question.objects.filter(id=answer.related_question_id).update(
+                    **get_change_update())
+
                 return right_answer.id if right_answer else None
 
         except Answer.DoesNotExist:
@@ -231,9 +360,7 @@ class Question(models.Model):
         """
         :return: avatar of author of Question instance
         """
-        avatar = UserProfile.get_profile(self.author.id).avatar
-        if avatar:
-            return '/' + avatar.url
+        return get_author_avatar(self.author)
 
 
 class Answer(models.Model):
@@ -257,6 +384,13 @@ class Answer(models.Model):
 
     rating = models.IntegerField(null=False, blank=False, default=0)
 
+    class Meta:
+        # Answers of a question are sorted by rating, see get_answers_page
+        indexes = [
+            models.Index(fields=('related_question', 'rating'),
+                         name='answer_question_rating_idx'),
+        ]
+
     def __str__(self):
         return self.answer_text
 
@@ -266,28 +400,28 @@ class Answer(models.Model):
         :param request: HTTP request
         :param question:
 
-        Function creates new answer and if settings.EMAIL_HOST_USER is specified
-        notify author of question with email
-        """
-        Answer.objects.create(
-            answer_text=request.POST.get('Text'),
-            related_question=question,
-            author=request.user,
-            pub_date=timezone.now()
-        )
-
-        # Notify author of the question with an email
-        if settings.EMAIL_HOST_USER:
-            subject, from_email, to = "You get an answer to your question", \
-                                      'noreply@hasker.com', question.author.email
-            text_content = ''
-            html_content = email_template.format(
-                question_text=question.question_text,
-                link=settings.BASE_URL + question.get_url())
-
-            msg = EmailMultiAlternatives(subject, text_content, from_email, [to])
-            msg.attach_alternative(html_content, "text/html")
-            msg.send()
+        Function creates new answer, raises hot score of the question and
+        if settings.EMAIL_HOST_USER is specified enqueues email notification
+        of question author, it is sent by manage.py send_notifications
+        """
+        with transaction.atomic():
+            answer = Answer.objects.create(
+                answer_text=request.POST.get('Text'),
+                related_question=question,
+                author=request.user,
+                pub_date=timezone.now()
+            )
+
+            Question.objects.filter(id=question.id).update(
+                hot_score=get_hot_score_update(answers_delta=1), **get_change_update())
+
+            if settings.EMAIL_HOST_USER:
+                # In digest mode the first answer waits for others during the window
+                AnswerNotification.objects.create(
+                    answer=answer,
+                    run_after=timezone.now() + datetime.timedelta(
+                        seconds=settings.NOTIFICATION_DIGEST_WINDOW
+                        if settings.NOTIFICATION_DIGEST else 0))
 
     @staticmethod
     def get_answers_page(request):
@@ -301,11 +435,13 @@ class Answer(models.Model):
         batch = request.GET.get('batch', settings.ANSWERS_BATCH)
 
         # Get answer to the question and then get page accordingly to request
-        answers = Answer.objects.filter(
-            related_question_id=question_id).order_by('-rating')
+        answers = Answer.objects.select_related(
+            'author', 'author__userprofile'
+        ).filter(related_question_id=question_id).order_by('-rating')
 
         paginator = Paginator(answers, batch)
         answers = paginator.get_page(page)
+        answers.object_list = vote_buffer.merge_pending('a', answers.object_list)
 
         # Get id of right answer to the question
         right_one = None
@@ -319,9 +455,7 @@ class Answer(models.Model):
         """
         :return: avatar of author of Answer instance
         """
-        avatar = UserProfile.get_profile(self.author.id).avatar
-        if avatar:
-            return '/' + avatar.url
+        return get_author_avatar(self.author)
 
 
 class VoteQuestion(models.Model):
@@ -338,6 +472,12 @@ class VoteQuestion(models.Model):
     up = models.BooleanField(null=False, blank=True, default=False)
     down = models.BooleanField(null=False, blank=True, default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('voter', 'text_field'),
+                                    name='unique_question_vote'),
+        ]
+
 
 class VoteAnswer(models.Model):
     """
@@ -353,6 +493,42 @@ class VoteAnswer(models.Model):
     up = models.BooleanField(null=False, blank=True, default=False)
     down = models.BooleanField(null=False, blank=True, default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('voter', 'text_field'),
+                                    name='unique_answer_vote'),
+        ]
+
+
+class AnswerNotification(models.Model):
+    """
+    Job of email notification of question author about new answer.
+    Jobs are sent by worker (manage.py send_notifications) out of request.
+
+    status:
+        PENDING -> waits for run_after
+        RUNNING -> claimed by worker until run_after, then it can be claimed again
+        FAILED  -> was not sent in settings.NOTIFICATION_MAX_ATTEMPTS attempts
+    Sent jobs are deleted.
+    """
+    PENDING = 'p'
+    RUNNING = 'r'
+    FAILED = 'f'
+    STATUSES = ((PENDING, 'pending'), (RUNNING, 'running'), (FAILED, 'failed'))
+
+    answer = models.ForeignKey(to=Answer, on_delete=models.CASCADE,
+                               null=False, blank=False)
+    status = models.CharField(max_length=1, choices=STATUSES, default=PENDING)
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    claimed_by = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=('status', 'run_after'), name='notification_claim_idx'),
+        ]
+
 
 def do_vote(question_or_answer, text_object_id, user_id, vote_status):
     """
@@ -365,37 +541,72 @@ def do_vote(question_or_answer, text_object_id, user_id, vote_status):
         'up'   -> raise rating of an object
         'down' -> decrease rating of an object
     :return new rating of a question if it has changed or None if not
-    """
 
-    if validate_user_is_author(question_or_answer, text_object_id, user_id):
+    atomic transaction -> move vote of the user one step to vote_status:
+                          opposite vote is cancelled, new vote is created
+                          (unique constraint allows only one vote per user)
+                       -> apply delta to the rating of an object if user is
+                          not its author, otherwise roll back the vote
+                       -> after commit move question in the trending list
+                       -> bump versions of cached fragments with the object
+                          (for answer it is done by update_rating)
+    """
+    if vote_status not in ('up', 'down'):
         return None
 
     object_class = VoteQuestion if question_or_answer == 'q' else VoteAnswer
-    result = None
+    reverse_status = 'down' if vote_status == 'up' else 'up'
 
-    try:
-        current_object = object_class.objects.get(
-            voter_id=user_id, text_field_id=text_object_id)
-    except (VoteQuestion.DoesNotExist, VoteAnswer.DoesNotExist):
-        current_object = None
-
-    if not current_object:
-        current_object = object_class.objects.create(
-            voter_id=user_id, text_field_id=text_object_id)
-
-    for value, reverse_value in (('up', 'down'), ('down', 'up')):
+    with transaction.atomic():
         # Do nothing if voice is already equal to new status
-        if vote_status == value and not current_object.__dict__.get(value):
-            if current_object.__dict__.get(reverse_value):
-                current_object.__dict__[reverse_value] = False
-            else:
-                current_object.__dict__[value] = True
-            result = update_rating(question_or_answer, text_object_id, value)
-            current_object.save()
+        changed = object_class.objects.filter(
+            voter_id=user_id, text_field_id=text_object_id,
+            **{vote_status: False}
+        ).update(**{
+            vote_status: models.Case(
+                models.When(**{reverse_status: True}, then=models.Value(False)),
+                default=models.Value(True),
+                output_field=models.BooleanField()),
+            reverse_status: False,
+        })
+
+        if not changed:
+            try:
+                with transaction.atomic():
+                    object_class.objects.create(
+                        voter_id=user_id, text_field_id=text_object_id,
+                        **{vote_status: True})
+            except IntegrityError:
+                return None
+
+        result = update_rating(question_or_answer, text_object_id,
+                               vote_status, user_id)
+        if result is None:
+            transaction.set_rollback(True)
+        elif question_or_answer == 'q':
+            transaction.on_commit(lambda: trending.update_question(text_object_id, result))
+            fragments.bump_on_commit(fragments.QUESTIONS,
+                                     fragments.question_version(text_object_id))
 
     return result
 
 
+def get_author_avatar(author):
+    """
+    :param author: User instance
+    :return: url of author's avatar or None if author has no avatar
+
+    Profile is taken from select_related cache if it is present, so listings
+    do not query (or create) a profile for every rendered row
+    """
+    try:
+        avatar = author.userprofile.avatar
+    except UserProfile.DoesNotExist:
+        return None
+    if avatar:
+        return '/' + avatar.url
+
+
 def validate_user_is_author(question_or_answer, text_object_id, user_id):
     """
     :param question_or_answer:
@@ -410,7 +621,7 @@ def validate_user_is_author(question_or_answer, text_object_id, user_id):
         return True
 
 
-def update_rating(question_or_answer, text_object_id, up_or_down):
+def update_rating(question_or_answer, text_object_id, up_or_down, user_id=None):
     """
     :param question_or_answer:
         'q' -> Question
@@ -419,13 +630,151 @@ def update_rating(question_or_answer, text_object_id, up_or_down):
     :param up_or_down:
         'up'   -> raise rating of an object
         'down' -> decrease rating of an object
-    :return: new rating of an object
+    :param user_id: voter, rating of his or her own object is not changed
+    :return: new rating of an object or None if rating was not changed
+
+    Rating of an answer is on the page of its question, so version of answers
+    of the question is bumped (and version of the question in database when
+    rating is changed there)
     """
     object_class = Question if question_or_answer == 'q' else Answer
+    delta = 1 if up_or_down == "up" else -1
+
+    objects = object_class.objects.filter(id=text_object_id)
+    if user_id is not None:
+        objects = objects.exclude(author_id=user_id)
+
+    # Put delta to the buffer, it is flushed to database later in batches
+    if settings.VOTE_BUFFER:
+        if question_or_answer == 'a':
+            rating, question_id = objects.values_list(
+                'rating', 'related_question_id').first() or (None, None)
+        else:
+            rating = objects.values_list('rating', flat=True).first()
+        if rating is None:
+            return None
+
+        if question_or_answer == 'a':
+            fragments.bump_on_commit(fragments.question_version(question_id))
+
+        text_object_id = int(text_object_id)
+        pending = vote_buffer.get_pending(
+            question_or_answer, [text_object_id]).get(text_object_id, 0)
+        transaction.on_commit(lambda: vote_buffer.add_delta(
+            question_or_answer, text_object_id, delta))
+
+        return rating + pending + delta
+
+    # Change rating in database to not lose concurrent votes
+    if not objects.update(**get_rating_update(question_or_answer, delta)):
+        return None
+
+    if question_or_answer == 'a':
+        question_id = Answer.objects.values_list(
+            'related_question_id', flat=True).get(id=text_object_id)
+        Question.objects.filter(id=question_id).update(**get_change_update())
+        fragments.bump_on_commit(fragments.question_version(question_id))
+
+    return object_class.objects.values_list(
+        'rating', flat=True).get(id=text_object_id)
 
-    # Get an instance
-    current_object = object_class.objects.get(id=text_object_id)
-    current_object.rating += 1 if up_or_down == "up" else -1
-    current_object.save()
 
-    return current_object.rating
+def get_rating_update(question_or_answer, delta):
+    """
+    :param question_or_answer:
+        'q' -> Question
+        'a' -> Answer
+    :param delta: change of rating, number or expression
+    :return: kwargs for update() of rating, hot score and version
+             of questions are updated too
+    """
+    update = {'rating': models.F('rating') + delta}
+    if question_or_answer == 'q':
+        update['hot_score'] = get_hot_score_update(rating_delta=delta)
+        update.update(get_change_update())
+    return update
+
+
+def get_change_update():
+    """
+    :return: kwargs for update() of questions which page is changed,
+             version and time of change are used for conditional GET
+    """
+    return {'version': models.F('version') + 1, 'updated_at': Now()}
+
+
+def get_number_of_answers():
+    """
+    :return: expression with number of answers of a question
+
+    It is a subquery instead of Count aggregate, so there is no GROUP BY
+    and listings can be sorted and limited with indexes
+    """
+    return Coalesce(models.Subquery(
+        Answer.objects.filter(related_question=models.OuterRef('pk')).order_by().values(
+            'related_question').annotate(count=models.Count('id')).values('count')), 0)
+
+
+def get_hot_score(rating, number_of_answers, pub_date):
+    """
+    :param rating:
+    :param number_of_answers:
+    :param pub_date:
+    :return: hot score of a question
+
+    Hot score is order of magnitude of votes and answers with their sign plus
+    time of publication. So newer question with 10 votes is equal to question with
+    100 votes published settings.HOT_SCORE_DECAY seconds earlier, and score of
+    a question does not change with time
+    """
+    score = rating + settings.HOT_SCORE_ANSWER_WEIGHT * number_of_answers
+    sign = (score > 0) - (score < 0)
+    return sign * math.log10(max(abs(score), 1)) + \
+        (pub_date - HOT_SCORE_EPOCH).total_seconds() / settings.HOT_SCORE_DECAY
+
+
+def get_hot_score_update(rating_delta=0, answers_delta=0):
+    """
+    :param rating_delta: change of rating, number or expression
+    :param answers_delta: number of answers added before update
+    :return: expression for update() which changes hot score of questions
+             as get_hot_score would do, time part of the score is kept
+    """
+    number_of_answers = get_number_of_answers()
+
+    old_score = models.F('rating') + \
+        settings.HOT_SCORE_ANSWER_WEIGHT * (number_of_answers - answers_delta)
+    new_score = old_score + rating_delta + settings.HOT_SCORE_ANSWER_WEIGHT * answers_delta
+
+    def get_votes_part(score):
+        return Cast(Sign(score), models.FloatField()) * \
+            Log(10, Greatest(Abs(score), 1))
+
+    return models.F('hot_score') + get_votes_part(new_score) - get_votes_part(old_score)
+
+
+def refresh_hot_scores(batch_size):
+    """
+    :param batch_size: number of questions updated with one query
+    :return: number of updated questions
+
+    Recalculate hot score of all questions, it fixes scores of questions
+    changed without models (or with buffered votes)
+    """
+    questions = Question.objects.annotate(
+        number_of_answers=models.Count('answer')
+    ).only('id', 'rating', 'pub_date', 'hot_score').order_by('id')
+
+    updated, last_id = 0, 0
+    while True:
+        batch = list(questions.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return updated
+
+        for question in batch:
+            question.hot_score = get_hot_score(
+                question.rating, question.number_of_answers, question.pub_date)
+
+        Question.objects.bulk_update(batch, ['hot_score'])
+        updated += len(batch)
+        last_id = batch[-1].id
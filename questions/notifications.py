@@ -0,0 +1,193 @@
+import datetime
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.mail import get_connection, EmailMultiAlternatives
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import digest_answer_template, digest_template, email_template, \
+    AnswerNotification
+
+logger = logging.getLogger(__name__)
+
+
+# ********************* FUNCTIONS ********************#
+
+def claim(batch_size, digest=False):
+    """
+    :param batch_size: maximum number of claimed jobs which are due
+    :param digest: claim also all pending jobs of authors of due jobs
+    :return: list of claimed jobs with answers and questions
+
+    Job is claimed by UPDATE with unique token of the worker, so concurrent
+    workers never get the same job. On databases with SKIP LOCKED rows locked
+    by other workers are skipped instead of waiting for them.
+    Claimed job is locked for settings.NOTIFICATION_LOCK_TIMEOUT seconds,
+    if worker dies the job is claimed again after that.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    claimable = models.Q(status__in=(AnswerNotification.PENDING, AnswerNotification.RUNNING),
+                         run_after__lte=now)
+    lock = {'status': AnswerNotification.RUNNING, 'claimed_by': token,
+            'run_after': now + datetime.timedelta(seconds=settings.NOTIFICATION_LOCK_TIMEOUT)}
+
+    with transaction.atomic():
+        jobs = AnswerNotification.objects.filter(claimable).order_by('run_after', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            jobs = jobs.select_for_update(skip_locked=True)
+
+        ids = list(jobs.values_list('id', flat=True)[:batch_size])
+
+        # Status and time are checked again, job could be claimed meanwhile
+        AnswerNotification.objects.filter(claimable, id__in=ids).update(**lock)
+
+        if digest and ids:
+            # Authors with due jobs get all their answers in one digest
+            jobs = AnswerNotification.objects.filter(
+                status=AnswerNotification.PENDING,
+                answer__related_question__author__in=AnswerNotification.objects.filter(
+                    claimed_by=token).values('answer__related_question__author'))
+            if connection.features.has_select_for_update_skip_locked:
+                jobs = jobs.select_for_update(skip_locked=True, of=('self',))
+
+            AnswerNotification.objects.filter(
+                id__in=list(jobs.values_list('id', flat=True)),
+                status=AnswerNotification.PENDING).update(**lock)
+
+    return list(AnswerNotification.objects.select_related(
+        'answer__related_question__author'
+    ).filter(claimed_by=token, status=AnswerNotification.RUNNING).order_by('id'))
+
+
+def get_message(job):
+    """
+    :param job: AnswerNotification with answer and question
+    :return: email for author of the question
+    """
+    question = job.answer.related_question
+    html_content = email_template.format(
+        question_text=question.question_text,
+        link=settings.BASE_URL + question.get_url())
+
+    msg = EmailMultiAlternatives("You get an answer to your question", '',
+                                 'noreply@hasker.com', [question.author.email])
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def get_digest(jobs):
+    """
+    :param jobs: AnswerNotification jobs of one author of questions
+    :return: one email with all new answers of the jobs
+    """
+    if len(jobs) == 1:
+        return get_message(jobs[0])
+
+    answers = ''.join(
+        digest_answer_template.format(
+            question_title=escape(job.answer.related_question.question_title),
+            answer_text=escape(job.answer.answer_text),
+            link=settings.BASE_URL + job.answer.related_question.get_url())
+        for job in jobs)
+    html_content = digest_template.format(number=len(jobs), answers=answers)
+
+    msg = EmailMultiAlternatives(
+        "You get {} answers to your questions".format(len(jobs)), '',
+        'noreply@hasker.com', [jobs[0].answer.related_question.author.email])
+    msg.attach_alternative(html_content, "text/html")
+    return msg
+
+
+def complete(job):
+    """
+    :param job: sent AnswerNotification
+    """
+    AnswerNotification.objects.filter(id=job.id, claimed_by=job.claimed_by).delete()
+
+
+def retry(job, error):
+    """
+    :param job: AnswerNotification which was not sent
+    :param error: exception raised by sending
+
+    Job is sent again after settings.NOTIFICATION_RETRY_DELAY seconds,
+    the delay is doubled with every attempt
+    """
+    attempts = job.attempts + 1
+    if attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        status, delay = AnswerNotification.FAILED, 0
+    else:
+        status, delay = AnswerNotification.PENDING, \
+                        settings.NOTIFICATION_RETRY_DELAY * 2 ** job.attempts
+
+    AnswerNotification.objects.filter(id=job.id, claimed_by=job.claimed_by).update(
+        status=status, attempts=attempts, last_error=repr(error),
+        run_after=timezone.now() + datetime.timedelta(seconds=delay))
+
+
+def send_notifications(batch_size, digest=None):
+    """
+    :param batch_size: maximum number of due jobs sent at once
+    :param digest: group notifications of every author in one email,
+                   settings.NOTIFICATION_DIGEST by default
+    :return: number of sent and number of failed notifications
+
+    All emails of the batch are sent over one connection. If the connection
+    is not opened, all claimed jobs are retried with backoff.
+    """
+    if digest is None:
+        digest = settings.NOTIFICATION_DIGEST
+
+    jobs = claim(batch_size, digest)
+    if not jobs:
+        return 0, 0
+
+    if digest:
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job.answer.related_question.author_id, []).append(job)
+        groups = list(groups.values())
+    else:
+        groups = [[job] for job in jobs]
+
+    sent = failed = 0
+
+    email_connection = get_connection()
+    try:
+        email_connection.open()
+    except Exception as error:
+        logger.exception('Connection for notifications %s is not opened',
+                         [job.id for job in jobs])
+        for job in jobs:
+            retry(job, error)
+        return 0, len(jobs)
+
+    try:
+        for group in groups:
+            try:
+                email_connection.send_messages([get_digest(group)])
+            except Exception as error:
+                logger.exception('Notifications %s are not sent', [job.id for job in group])
+                for job in group:
+                    retry(job, error)
+                failed += len(group)
+            else:
+                for job in group:
+                    complete(job)
+                sent += len(group)
+    finally:
+        email_connection.close()
+
+    return sent, failed
+
+
+def retry_failed():
+    """
+    :return: number of failed jobs which are returned to the queue
+    """
+    return AnswerNotification.objects.filter(status=AnswerNotification.FAILED).update(
+        status=AnswerNotification.PENDING, attempts=0, run_after=timezone.now())
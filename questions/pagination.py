@@ -0,0 +1,136 @@
+import binascii
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models
+
+
+class CursorPage(Sequence):
+    """
+    Page of CursorPaginator. It has the same has_next/has_previous interface
+    as django Page, but instead of numbers it knows cursors of pages around.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator:
+    """
+    Keyset paginator sorts objects by (field, id) in descending order.
+    Page is found by filter on position from cursor, so there is no COUNT(*)
+    and no OFFSET and deep pages are as fast as the first one.
+
+    Cursor is opaque urlsafe base64 of [direction, field value, id] where
+    direction is 'n' -> objects after position, 'p' -> objects before position.
+    """
+
+    def __init__(self, queryset, field, per_page):
+        self.queryset = queryset
+        self.field = field
+        self.per_page = get_batch(per_page)
+
+    def encode_cursor(self, direction, obj):
+        """
+        :param direction: 'n' or 'p'
+        :param obj: first or last object of the page
+        :return: cursor of the page after or before obj
+        """
+        value = self.queryset.model._meta.get_field(self.field).value_to_string(obj)
+        return urlsafe_b64encode(
+            json.dumps([direction, value, obj.id]).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        :param cursor: cursor from request
+        :return: direction, value of field and id or None if cursor is incorrect
+        """
+        try:
+            direction, value, id_ = json.loads(urlsafe_b64decode(cursor.encode()))
+            value = self.queryset.model._meta.get_field(self.field).to_python(value)
+            id_ = int(id_)
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            return None
+
+        if direction not in ('n', 'p') or value is None:
+            return None
+
+        return direction, value, id_
+
+    def get_queryset(self, position=None):
+        """
+        :param position: decoded cursor or None for the first page
+        :return: sorted queryset of objects after or before position
+        """
+        if position is None:
+            return self.queryset.order_by('-' + self.field, '-id')
+
+        direction, value, id_ = position
+
+        # Condition on field alone lets database seek the (field, id) index
+        if direction == 'n':
+            return self.queryset.filter(
+                models.Q(**{self.field + '__lte': value}),
+                models.Q(**{self.field + '__lt': value}) | models.Q(id__lt=id_)
+            ).order_by('-' + self.field, '-id')
+
+        return self.queryset.filter(
+            models.Q(**{self.field + '__gte': value}),
+            models.Q(**{self.field + '__gt': value}) | models.Q(id__gt=id_)
+        ).order_by(self.field, 'id')
+
+    def get_page(self, cursor=None):
+        """
+        :param cursor: cursor of the page, first page if cursor is empty or incorrect
+        :return: CursorPage with objects
+        """
+        position = self.decode_cursor(cursor) if cursor else None
+
+        # Get one more object to know if there is one more page
+        objects = list(self.get_queryset(position)[:self.per_page + 1])
+        is_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+
+        if position is not None and position[0] == 'p':
+            objects.reverse()
+            has_next, has_previous = True, is_more
+        else:
+            has_next, has_previous = is_more, position is not None
+
+        return CursorPage(
+            objects,
+            self.encode_cursor('n', objects[-1]) if has_next and objects else None,
+            self.encode_cursor('p', objects[0]) if has_previous and objects else None)
+
+
+# ********************* FUNCTIONS ********************#
+
+def get_batch(value, default=None):
+    """
+    :param value: number of objects on one page, e.g. from request, or None
+    :param default: number of objects if value is None
+    :return: number of objects, at most settings.BATCH_LIMIT
+    :raise ValueError: if value is not a positive number
+    """
+    batch = int(default if value is None else value)
+    if batch < 1:
+        raise ValueError('batch should be positive')
+    return min(batch, settings.BATCH_LIMIT)
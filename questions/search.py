@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+_backend = None
+
+
+# ********************* BACKENDS **********************#
+
+class SearchBackend:
+    """
+    Default backend searches every word in title or text of a question
+    with icontains. It needs no index, but it scans the whole table.
+    """
+
+    def index_question(self, question):
+        """
+        :param question: new or changed Question instance
+        """
+
+    def remove_question(self, question_id):
+        """
+        :param question_id: id of deleted question
+        """
+
+    def rebuild(self):
+        """
+        Index all questions from scratch
+        """
+
+    def search(self, questions, words):
+        """
+        :param questions: queryset of questions
+        :param words: list of words from search query
+        :return: questions found by words sorted by relevance
+        """
+        for word in words:
+            questions = questions.filter(models.Q(question_title__icontains=word) |
+                                         models.Q(question_text__icontains=word))
+
+        return questions.order_by('-rating', '-pub_date')
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Backend uses Question.search_vector (tsvector column with GIN index),
+    title has higher weight than text. Words are matched as prefixes and
+    found questions are sorted by SearchRank.
+    """
+
+    @staticmethod
+    def get_vector():
+        return SearchVector('question_title', weight='A', config=settings.SEARCH_CONFIG) + \
+               SearchVector('question_text', weight='B', config=settings.SEARCH_CONFIG)
+
+    def index_question(self, question):
+        from .models import Question
+        Question.objects.filter(id=question.id).update(search_vector=self.get_vector())
+
+    def rebuild(self):
+        from .models import Question
+        Question.objects.update(search_vector=self.get_vector())
+
+    def search(self, questions, words):
+        query = SearchQuery(
+            ' & '.join("'{}':*".format(word.replace('\\', '').replace("'", "''"))
+                       for word in words),
+            search_type='raw', config=settings.SEARCH_CONFIG)
+
+        return questions.filter(search_vector=query).annotate(
+            rank=SearchRank(models.F('search_vector'), query)
+        ).order_by('-rank', '-rating', '-pub_date')
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    Backend for local development uses FTS5 virtual table with copy of
+    title and text of every question. Words are matched as prefixes.
+    """
+    table = 'questions_question_fts'
+
+    def index_question(self, question):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table} WHERE rowid = %s'.format(table=self.table),
+                           [question.id])
+            cursor.execute(
+                'INSERT INTO {table} (rowid, question_title, question_text) '
+                'VALUES (%s, %s, %s)'.format(table=self.table),
+                [question.id, question.question_title, question.question_text])
+
+    def remove_question(self, question_id):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table} WHERE rowid = %s'.format(table=self.table),
+                           [question_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {table}'.format(table=self.table))
+            cursor.execute(
+                'INSERT INTO {table} (rowid, question_title, question_text) '
+                'SELECT id, question_title, question_text '
+                'FROM questions_question'.format(table=self.table))
+
+    def search(self, questions, words):
+        query = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+        return questions.filter(id__in=RawSQL(
+            'SELECT rowid FROM {table} WHERE {table} MATCH %s'.format(table=self.table),
+            [query])).order_by('-rating', '-pub_date')
+
+
+# ********************* FUNCTIONS **********************#
+
+def get_search_backend():
+    """
+    :return: backend from settings.SEARCH_BACKEND or backend matched to the database
+    """
+    global _backend
+
+    if _backend is None:
+        if settings.SEARCH_BACKEND:
+            _backend = import_string(settings.SEARCH_BACKEND)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        elif connection.vendor == 'sqlite' and \
+                SQLiteSearchBackend.table in connection.introspection.table_names():
+            _backend = SQLiteSearchBackend()
+        else:
+            _backend = SearchBackend()
+
+    return _backend
@@ -0,0 +1,94 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import fragments, trending
+from .models import get_hot_score, Answer, Question, UserProfile
+from .search import get_search_backend
+
+
+@receiver(pre_save, sender=Question)
+def set_hot_score(sender, instance, **kwargs):
+    """
+    Calculate hot score of new question
+    """
+    if instance._state.adding and not instance.hot_score:
+        instance.hot_score = get_hot_score(instance.rating, 0, instance.pub_date)
+
+
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep search index in sync when title or text of a question is saved
+    """
+    if update_fields and not {'question_title', 'question_text'} & set(update_fields):
+        return
+    get_search_backend().index_question(instance)
+
+
+@receiver(post_delete, sender=Question)
+def remove_question(sender, instance, **kwargs):
+    """
+    Remove deleted question from search index
+    """
+    get_search_backend().remove_question(instance.id)
+
+
+@receiver(post_save, sender=Question)
+def update_trending(sender, instance, created, **kwargs):
+    """
+    New question can get into trending list if there are few questions,
+    changed question is not tracked, so the list is rebuilt
+    """
+    if created:
+        transaction.on_commit(lambda: trending.update_question(
+            instance.id, instance.rating, instance.question_title))
+    else:
+        transaction.on_commit(trending.invalidate)
+
+
+@receiver(post_delete, sender=Question)
+def remove_trending(sender, instance, **kwargs):
+    """
+    Remove deleted question from trending list
+    """
+    question_id = instance.id
+    transaction.on_commit(lambda: trending.update_question(question_id, None))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_question_fragments(sender, instance, **kwargs):
+    """
+    Cached listings and page of the question are outdated by new, changed
+    or deleted question
+    """
+    fragments.bump_on_commit(fragments.QUESTIONS, fragments.question_version(instance.id))
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def bump_answer_fragments(sender, instance, **kwargs):
+    """
+    Answer changes cached answers of its question and number of answers in listings
+    """
+    fragments.bump_on_commit(fragments.QUESTIONS,
+                             fragments.question_version(instance.related_question_id))
+
+
+@receiver(post_save, sender=UserProfile)
+def bump_profile_fragments(sender, instance, **kwargs):
+    """
+    Avatars are rendered in every cached fragment
+    """
+    fragments.bump_on_commit(fragments.PROFILES)
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    """
+    Profile is created at signup, so pages with avatars only read profiles
+    """
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
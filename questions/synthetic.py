@@ -0,0 +1,113 @@
+import datetime
+import itertools
+import random
+
+from django.db import models
+from django.utils import timezone
+
+from .models import Answer, Question
+
+# Words of titles and texts, search of benchmarks looks for them
+WORDS = ('python', 'django', 'query', 'index', 'cache', 'server', 'thread', 'memory',
+         'error', 'request', 'template', 'model', 'database', 'migration', 'test',
+         'deploy', 'docker', 'network', 'socket', 'string', 'list', 'dict', 'class',
+         'function', 'loop', 'import', 'module', 'package', 'version', 'update')
+
+
+# ********************* FUNCTIONS ********************#
+
+def get_zipf_weights(number, exponent):
+    """
+    :param number: number of items
+    :param exponent: exponent of Zipf distribution, the bigger the more
+                     popular are the first items
+    :return: cumulative weights of items for random.choices
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, number + 1)))
+
+
+def get_text(rng, number_of_words):
+    return ' '.join(rng.choice(WORDS) for _ in range(number_of_words))
+
+
+def get_votes(rng, voters, mean):
+    """
+    :param rng: random.Random
+    :param voters: usernames of users who can vote
+    :param mean: mean number of votes
+    :return: list of (voter, up), every user votes once
+    """
+    number = min(len(voters), int(rng.expovariate(1 / mean))) if mean else 0
+    return [(voter, rng.random() < 0.7) for voter in rng.sample(voters, number)]
+
+
+def iter_records(users=100, questions=1000, answers=3, votes=5, tags=200,
+                 exponent=1.1, days=365, seed=None):
+    """
+    :param users: number of users
+    :param questions: number of questions
+    :param answers: mean number of answers to a question
+    :param votes: mean number of votes for a question or an answer
+    :param tags: number of tags, every question has from one to three of them
+                 chosen with Zipf distribution
+    :param exponent: exponent of Zipf distribution of tags
+    :param days: questions are published during this number of days
+    :param seed: seed of random numbers, the same seed gives the same data
+    :return: records of questions, answers and votes for questions.importer.Importer,
+             ids continue after ids in the database
+    """
+    rng = random.Random(seed)
+    usernames = ['user{}'.format(number) for number in range(1, users + 1)]
+    tag_texts = ['tag{}'.format(number) for number in range(1, tags + 1)]
+    tag_weights = get_zipf_weights(tags, exponent)
+    now = timezone.now()
+
+    question_ids = itertools.count(
+        (Question.objects.aggregate(models.Max('id'))['id__max'] or 0) + 1)
+    answer_ids = itertools.count(
+        (Answer.objects.aggregate(models.Max('id'))['id__max'] or 0) + 1)
+
+    for _ in range(questions):
+        question_id = next(question_ids)
+        pub_date = now - datetime.timedelta(seconds=rng.uniform(0, days * 24 * 3600))
+        question_votes = get_votes(rng, usernames, votes)
+
+        yield {
+            'type': 'question',
+            'id': question_id,
+            'author': rng.choice(usernames),
+            'question_title': get_text(rng, rng.randint(3, 8)).capitalize(),
+            'question_text': get_text(rng, rng.randint(10, 60)),
+            'pub_date': pub_date.isoformat(),
+            'rating': sum(1 if up else -1 for _, up in question_votes),
+            'question_tags': sorted(set(rng.choices(
+                tag_texts, cum_weights=tag_weights, k=rng.randint(1, 3)))),
+        }
+
+        for voter, up in question_votes:
+            yield {'type': 'question_vote', 'text_field_id': question_id,
+                   'voter': voter, 'up': up, 'down': not up}
+
+        number_of_answers = int(rng.expovariate(1 / answers)) if answers else 0
+        right = rng.randrange(number_of_answers) if number_of_answers and \
+            rng.random() < 0.5 else None
+
+        for number in range(number_of_answers):
+            answer_id = next(answer_ids)
+            answer_votes = get_votes(rng, usernames, votes)
+
+            yield {
+                'type': 'answer',
+                'id': answer_id,
+                'related_question_id': question_id,
+                'author': rng.choice(usernames),
+                'answer_text': get_text(rng, rng.randint(5, 40)),
+                'pub_date': (pub_date + datetime.timedelta(
+                    seconds=rng.uniform(0, 7 * 24 * 3600))).isoformat(),
+                'right': number == right,
+                'rating': sum(1 if up else -1 for _, up in answer_votes),
+            }
+
+            for voter, up in answer_votes:
+                yield {'type': 'answer_vote', 'text_field_id': answer_id,
+                       'voter': voter, 'up': up, 'down': not up}
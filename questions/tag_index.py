@@ -0,0 +1,109 @@
+import bisect
+import heapq
+import threading
+import time
+
+from django.conf import settings
+from django.db import models
+
+# Longest prefix which top tags are found when index is built
+PRECOMPUTED_PREFIX = 2
+
+_index = None
+_rebuild_lock = threading.Lock()
+
+
+class TagIndex:
+    """
+    Index of tags of one process for autocomplete. Tags are kept in array
+    sorted by lower case text, so tags with a prefix are a slice found with
+    bisect. Top tags for short prefixes (which match most of the tags) are
+    found when index is built.
+    """
+
+    def __init__(self, tags, limit):
+        """
+        :param tags: list of (tag text, number of questions)
+        :param limit: maximum number of suggestions
+        """
+        self.built = time.monotonic()
+        self.limit = limit
+
+        tags = sorted(tags, key=lambda tag: tag[0].lower())
+        self.keys = [tag_text.lower() for tag_text, _ in tags]
+        self.tags = tags
+
+        groups = {}
+        for key, tag in zip(self.keys, tags):
+            for length in range(min(len(key), PRECOMPUTED_PREFIX) + 1):
+                groups.setdefault(key[:length], []).append(tag)
+        self.top = {prefix: self.get_top(group) for prefix, group in groups.items()}
+
+    def get_top(self, tags):
+        """
+        :param tags: list of (tag text, number of questions)
+        :return: self.limit tags used in the most questions
+        """
+        return heapq.nlargest(self.limit, tags, key=lambda tag: (tag[1], tag[0]))
+
+    def suggest(self, prefix):
+        """
+        :param prefix: beginning of a tag, case is ignored
+        :return: list of (tag text, number of questions) sorted by number of questions
+        """
+        prefix = prefix.lower()
+        if len(prefix) <= PRECOMPUTED_PREFIX:
+            return self.top.get(prefix, [])
+
+        # Keys with the prefix follow each other, upper bound as prefix with
+        # the largest character would miss characters out of BMP
+        start = end = bisect.bisect_left(self.keys, prefix)
+        while end < len(self.keys) and self.keys[end].startswith(prefix):
+            end += 1
+        return self.get_top(self.tags[start:end])
+
+
+# ********************* FUNCTIONS ********************#
+
+def build():
+    """
+    :return: new TagIndex with all tags and numbers of their questions
+    """
+    from .models import Tag
+
+    tags = Tag.objects.annotate(number_of_questions=models.Count('question')).values_list(
+        'tag_text', 'number_of_questions')
+    return TagIndex(list(tags), settings.TAG_SUGGEST_LIMIT)
+
+
+def get_index():
+    """
+    :return: index of this process, it is rebuilt every settings.TAG_INDEX_TIMEOUT
+             seconds by the first request which finds it outdated
+    """
+    global _index
+
+    index = _index
+    if index is None or time.monotonic() - index.built > settings.TAG_INDEX_TIMEOUT:
+        with _rebuild_lock:
+            if _index is index:
+                _index = build()
+            index = _index
+
+    return index
+
+
+def invalidate():
+    """
+    Remove index of this process, it is built on next request
+    """
+    global _index
+    _index = None
+
+
+def suggest(prefix):
+    """
+    :param prefix: beginning of a tag
+    :return: list of (tag text, number of questions) sorted by number of questions
+    """
+    return get_index().suggest(prefix)
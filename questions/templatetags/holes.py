@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from questions import fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name):
+    """
+    :param context: context of the page
+    :param name: name of template in questions/holes/
+    :return: rendered template with user specific content between markers,
+             page from cache is filled with the template for every user
+    """
+    content = context.template.engine.get_template(
+        fragments.HOLE_TEMPLATE.format(name=name)).render(context)
+    return mark_safe(fragments.wrap_hole(name, content))
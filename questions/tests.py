@@ -1,10 +1,33 @@
+import datetime
+import json
+import os
+import pstats
+import tempfile
+import time
+
 from http import HTTPStatus
+from io import StringIO
+from threading import Thread
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command, CommandError
+from django.db import connection, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
-from .models import Answer, Question, Tag
+from hasker import metrics, profiler, slow_queries
+
+from . import benchmark, fragments, loadtest, notifications, trending, vote_buffer
+from .models import do_vote, get_hot_score, refresh_hot_scores, Answer, AnswerNotification, \
+    Question, Tag, UserProfile, VoteAnswer, VoteQuestion
+from .pagination import CursorPaginator
+from .search import get_search_backend
 
 
 class GETAnonymousTest(TestCase):
@@ -280,6 +303,8 @@ class RendererTest(TestCase):
     """
 
     def setUp(self):
+        trending.invalidate()
+
         self.user1 = User.objects.create_user(
             username='johndoe',
             email='johndoe@somemail.mail',
@@ -331,3 +356,1526 @@ class RendererTest(TestCase):
 
         self.assertContains(response, self.question1.question_title)
         self.assertNotContains(response, self.question2.question_title)
+
+
+class ListingQueriesTest(TestCase):
+    """
+    Class for test number of queries for rendered listings.
+    Number of queries should not depend on number of questions on the page:
+        -> trend list on index
+        -> date list on index
+        -> search render for words
+        -> trending
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.tags = [Tag.objects.create(tag_text='tag{}'.format(i)) for i in range(3)]
+
+    def create_questions(self, number):
+        for i in range(number):
+            question = Question.objects.create(
+                question_title='Title {}'.format(i),
+                question_text='Blah blah blah {}'.format(i),
+                pub_date=timezone.now(),
+                author=self.user)
+            question.question_tags.add(*self.tags)
+
+            Answer.objects.create(
+                answer_text='Doo roo ran ron',
+                related_question=question,
+                pub_date=timezone.now(),
+                author=self.user)
+
+    def test_pagination(self):
+        for number in (1, 8):
+            Question.objects.all().delete()
+            self.create_questions(number)
+
+            for data in ('d', 't'):
+                with self.assertNumQueries(3):
+                    response = self.client.get('/paginate_data/', {'data': data, 'page': 1})
+                self.assertContains(response, 'Title 0')
+
+    def test_cursor_pagination(self):
+        for number in (1, 8):
+            Question.objects.all().delete()
+            self.create_questions(number)
+
+            for data in ('d', 't'):
+                with self.assertNumQueries(2):
+                    response = self.client.get('/paginate_data/', {'data': data,
+                                                                    'cursor': ''})
+                self.assertContains(response, 'Title 0')
+
+    def test_search_by_word(self):
+        for number in (1, 8):
+            Question.objects.all().delete()
+            self.create_questions(number)
+
+            with self.assertNumQueries(3):
+                response = self.client.get('/get_search/?search=title')
+            self.assertContains(response, 'Title 0')
+
+    @override_settings(TRENDING_CACHE='default')
+    def test_trending(self):
+        for number in (1, 5):
+            Question.objects.all().delete()
+            self.create_questions(number)
+            trending.invalidate()
+
+            with self.assertNumQueries(1):
+                response = self.client.get('/trending_data/')
+            self.assertContains(response, 'Title 0')
+
+            with self.assertNumQueries(0):
+                response = self.client.get('/trending_data/')
+            self.assertContains(response, 'Title 0')
+
+
+class VoteEngineTest(TestCase):
+    """
+    Class for test vote transitions of one user:
+        -> up and down votes
+        -> repeated vote
+        -> cancel of a vote
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.question = Question.objects.create(
+            question_title='Simple title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.user1)
+
+    def test_transitions(self):
+        self.assertEqual(do_vote('q', self.question.id, self.user2.id, 'up'), 1)
+        self.assertIsNone(do_vote('q', self.question.id, self.user2.id, 'up'))
+        self.assertEqual(do_vote('q', self.question.id, self.user2.id, 'down'), 0)
+        self.assertEqual(do_vote('q', self.question.id, self.user2.id, 'down'), -1)
+        self.assertIsNone(do_vote('q', self.question.id, self.user2.id, 'down'))
+
+        self.assertEqual(VoteQuestion.objects.count(), 1)
+        self.assertEqual(Question.objects.get(id=self.question.id).rating, -1)
+
+    def test_own_question(self):
+        self.assertIsNone(do_vote('q', self.question.id, self.user1.id, 'up'))
+        self.assertEqual(VoteQuestion.objects.count(), 0)
+
+    def test_anonymous(self):
+        self.assertIsNone(do_vote('q', self.question.id, None, 'up'))
+        self.assertEqual(Question.objects.get(id=self.question.id).rating, 0)
+
+
+class VoteConcurrencyTest(TransactionTestCase):
+    """
+    Class for test concurrent votes for one question.
+    Final rating should be equal to the sum of all votes.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.voters = [User.objects.create_user(
+            username='voter{}'.format(i),
+            password='nobodyknows') for i in range(12)]
+
+        self.question = Question.objects.create(
+            question_title='Simple title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.author)
+
+    def test_parallel_votes(self):
+        if connection.vendor == 'sqlite':
+            self.skipTest('SQLite does not allow concurrent writers')
+
+        votes = ['up' if i % 3 else 'down' for i in range(len(self.voters))]
+
+        def vote(voter, vote_status):
+            try:
+                # Each voter clicks twice, second click should be ignored
+                for _ in range(2):
+                    do_vote('q', self.question.id, voter.id, vote_status)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=vote, args=(voter, vote_status))
+                   for voter, vote_status in zip(self.voters, votes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Question.objects.get(id=self.question.id).rating,
+                         sum(1 if vote_status == 'up' else -1 for vote_status in votes))
+        self.assertEqual(VoteQuestion.objects.count(), len(self.voters))
+
+
+@override_settings(VOTE_BUFFER=True, VOTE_BUFFER_FLUSH_INTERVAL=None)
+class VoteBufferTest(TransactionTestCase):
+    """
+    Class for test buffered votes:
+        -> rating in database is not changed until flush
+        -> pending rating is merged on read
+        -> flush applies all deltas
+        -> flushed deltas expire
+        -> flush waits for slots which are not written yet and skips lost ones
+        -> flush_all does not run while buffer is flushed
+    """
+
+    def setUp(self):
+        vote_buffer.get_cache().clear()
+        trending.invalidate()
+
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.questions = [Question.objects.create(
+            question_title='Title {}'.format(i),
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.user1) for i in range(3)]
+
+        self.answer = Answer.objects.create(
+            answer_text='Doo roo ran ron',
+            related_question=self.questions[0],
+            pub_date=timezone.now(),
+            author=self.user1)
+
+    def test_pending_rating(self):
+        self.assertEqual(do_vote('q', self.questions[0].id, self.user2.id, 'up'), 1)
+        self.assertIsNone(do_vote('q', self.questions[0].id, self.user1.id, 'up'))
+
+        self.assertEqual(Question.objects.get(id=self.questions[0].id).rating, 0)
+        self.assertEqual(Question.get_trending_question()[0].rating, 1)
+
+        self.client.login(username=self.user2.username, password='notsosimple')
+        response = self.client.get(
+            '/vote/', {'value': 'q {} 1 down'.format(self.questions[0].id)})
+        self.assertContains(response, '0')
+
+    def test_flush(self):
+        do_vote('q', self.questions[0].id, self.user2.id, 'up')
+        do_vote('q', self.questions[1].id, self.user2.id, 'down')
+        do_vote('a', self.answer.id, self.user2.id, 'up')
+
+        self.assertEqual(vote_buffer.flush(), 3)
+        self.assertEqual(vote_buffer.flush(), 0)
+
+        self.assertEqual([question.rating for question in
+                          Question.objects.order_by('id')], [1, -1, 0])
+        self.assertEqual(Answer.objects.get(id=self.answer.id).rating, 1)
+        self.assertEqual(Question.get_trending_question()[0].rating, 1)
+
+    @override_settings(VOTE_BUFFER_DELTA_TIMEOUT=0.2)
+    def test_flushed_deltas_expire(self):
+        cache = vote_buffer.get_cache()
+        do_vote('q', self.questions[0].id, self.user2.id, 'up')
+        do_vote('a', self.answer.id, self.user2.id, 'up')
+
+        self.assertEqual(vote_buffer.flush(), 2)
+        time.sleep(0.3)
+
+        keys = [vote_buffer.delta_key('q', self.questions[0].id),
+                vote_buffer.delta_key('a', self.answer.id),
+                vote_buffer.slot_key(1), vote_buffer.slot_key(2)]
+        self.assertEqual(cache.get_many(keys), {})
+
+    def test_flush_answer_version(self):
+        question = self.answer.related_question
+        version = Question.objects.get(id=question.id).version
+
+        do_vote('a', self.answer.id, self.user2.id, 'up')
+        self.assertEqual(vote_buffer.flush(), 1)
+        self.assertEqual(Question.objects.get(id=question.id).version, version + 1)
+
+    def test_flush_all(self):
+        do_vote('q', self.questions[2].id, self.user2.id, 'up')
+        vote_buffer.get_cache().delete(vote_buffer.slot_key(1))
+
+        self.assertEqual(vote_buffer.flush(), 0)
+        self.assertEqual(vote_buffer.flush_all(), 1)
+        self.assertEqual(Question.objects.get(id=self.questions[2].id).rating, 1)
+
+    def test_slot_not_written_yet(self):
+        cache = vote_buffer.get_cache()
+        do_vote('q', self.questions[0].id, self.user2.id, 'up')
+
+        # Sequence is incremented, slot of the vote is not written yet
+        cache.incr(vote_buffer.SEQUENCE_KEY)
+        self.assertEqual(vote_buffer.flush(), 1)
+
+        cache.set(vote_buffer.slot_key(2),
+                  vote_buffer.delta_key('q', self.questions[1].id), timeout=None)
+        cache.set(vote_buffer.delta_key('q', self.questions[1].id), 1, timeout=None)
+        self.assertEqual(vote_buffer.flush(), 1)
+        self.assertEqual(Question.objects.get(id=self.questions[1].id).rating, 1)
+
+    @override_settings(VOTE_BUFFER_LOCK_TIMEOUT=0)
+    def test_lost_slot(self):
+        do_vote('q', self.questions[0].id, self.user2.id, 'up')
+        vote_buffer.get_cache().delete(vote_buffer.slot_key(1))
+        do_vote('q', self.questions[1].id, self.user2.id, 'up')
+
+        # The first flush waits for the slot, the next one skips it
+        self.assertEqual(vote_buffer.flush(), 0)
+        with self.assertLogs('questions.vote_buffer', 'WARNING'):
+            self.assertEqual(vote_buffer.flush(), 1)
+
+    @override_settings(VOTE_BUFFER_LOCK_TIMEOUT=0.2)
+    def test_flush_all_lock(self):
+        do_vote('q', self.questions[2].id, self.user2.id, 'up')
+        vote_buffer.get_cache().add(vote_buffer.LOCK_KEY, True, timeout=None)
+
+        with self.assertRaises(RuntimeError):
+            vote_buffer.flush_all()
+        self.assertEqual(Question.objects.get(id=self.questions[2].id).rating, 0)
+
+
+class SearchBackendTest(TestCase):
+    """
+    Class for test search backend of current database:
+        -> new question is found
+        -> words are matched as prefixes
+        -> changed and deleted questions
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.client.login(username='johndoe', password='nobodyknows')
+        self.client.post('/ask/', {'title': 'Unusual pelican',
+                                   'text': 'How fast does it fly over the ocean',
+                                   'tags': 'birds'})
+
+        self.question = Question.objects.get()
+
+    def test_search(self):
+        response = self.client.get('/get_search/?search=pelican ocean')
+        self.assertContains(response, 'Unusual pelican')
+
+        response = self.client.get('/get_search/?search=pelic')
+        self.assertContains(response, 'Unusual pelican')
+
+        response = self.client.get('/get_search/?search=pelican desert')
+        self.assertContains(response, 'No questions were found')
+
+    def test_update_and_delete(self):
+        self.question.question_title = 'Usual penguin'
+        self.question.save()
+
+        response = self.client.get('/get_search/?search=penguin')
+        self.assertContains(response, 'Usual penguin')
+
+        self.question.delete()
+
+        response = self.client.get('/get_search/?search=penguin')
+        self.assertContains(response, 'No questions were found')
+
+    def test_rebuild(self):
+        get_search_backend().rebuild()
+
+        response = self.client.get('/get_search/?search=pelican')
+        self.assertContains(response, 'Unusual pelican')
+
+
+class CursorPaginatorTest(TestCase):
+    """
+    Class for test keyset pagination:
+        -> walk forward and backward through all pages
+        -> questions with equal rating
+        -> incorrect cursor
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        for i in range(7):
+            Question.objects.create(
+                question_title='Title {}'.format(i),
+                question_text='Blah blah blah',
+                pub_date=timezone.now(),
+                rating=i // 3,
+                author=self.user)
+
+        self.expected = list(Question.objects.order_by('-rating', '-id'))
+
+    def test_walk(self):
+        paginator = CursorPaginator(Question.objects.all(), 'rating', 3)
+
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+
+        self.assertEqual([question for page in pages for question in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        page = pages[-1]
+        for expected_page in reversed(pages[:-1]):
+            page = paginator.get_page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected_page))
+        self.assertFalse(page.has_previous())
+
+    def test_incorrect_cursor(self):
+        paginator = CursorPaginator(Question.objects.all(), 'pub_date', 3)
+        first_page = list(Question.objects.order_by('-pub_date', '-id')[:3])
+
+        # Not base64, unknown direction, incorrect date
+        for cursor in ('abc', 'WyJ4IiwgMSwgMl0=', 'WyJuIiwgIngiLCAyXQ=='):
+            self.assertEqual(list(paginator.get_page(cursor)), first_page)
+
+    @override_settings(BATCH_ON_PAGE=3)
+    def test_render(self):
+        response = self.client.get('/paginate_data/', {'data': 't', 'cursor': ''})
+        next_cursor = response.context['question_list_by_trend'].next_cursor
+        self.assertContains(response, 'data-cursor="{}"'.format(next_cursor))
+
+        response = self.client.get('/paginate_data/', {'data': 't', 'cursor': next_cursor})
+        self.assertEqual(list(response.context['question_list_by_trend']), self.expected[3:6])
+
+
+@override_settings(TRENDING_BATCH=2, TRENDING_CACHE_FACTOR=2, TRENDING_CACHE='default')
+class TrendingTest(TransactionTestCase):
+    """
+    Class for test cached trending list:
+        -> list is the same as top of questions in the database after votes
+        -> questions enter and leave the list without queries to rebuild it
+        -> new and deleted questions
+        -> list is read from the database without TRENDING_CACHE
+    """
+
+    def setUp(self):
+        trending.invalidate()
+
+        self.author = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.voters = [User.objects.create_user(
+            username='voter{}'.format(i),
+            password='nobodyknows') for i in range(4)]
+
+        self.questions = [Question.objects.create(
+            question_title='Title {}'.format(i),
+            question_text='Blah blah blah',
+            pub_date=timezone.now(),
+            author=self.author) for i in range(6)]
+
+    def assertTrendingIsTop(self):
+        expected = list(Question.objects.order_by('-rating', '-id')[:2])
+
+        with self.assertNumQueries(0):
+            questions = Question.get_trending_question()
+
+        self.assertEqual([(question.id, question.question_title, question.rating)
+                          for question in questions],
+                         [(question.id, question.question_title, question.rating)
+                          for question in expected])
+
+    def test_votes(self):
+        trending.rebuild()
+
+        votes = [(0, 0, 'up'), (0, 1, 'up'), (1, 0, 'up'), (2, 5, 'down'),
+                 (1, 0, 'down'), (1, 0, 'down'), (3, 3, 'up'), (2, 3, 'up'),
+                 (0, 3, 'down'), (0, 3, 'down'), (3, 1, 'down'), (3, 1, 'down')]
+
+        for voter, question, vote_status in votes:
+            do_vote('q', self.questions[question].id, self.voters[voter].id, vote_status)
+            self.assertTrendingIsTop()
+
+    def test_new_and_deleted(self):
+        trending.rebuild()
+
+        do_vote('q', self.questions[4].id, self.voters[0].id, 'up')
+        self.assertTrendingIsTop()
+
+        Question.objects.create(
+            question_title='New title',
+            question_text='Blah blah blah',
+            pub_date=timezone.now(),
+            author=self.author)
+        self.assertTrendingIsTop()
+
+        self.questions[4].delete()
+        self.assertTrendingIsTop()
+
+    @override_settings(TRENDING_CACHE=None)
+    def test_disabled(self):
+        trending.rebuild()
+        self.assertIsNone(caches['default'].get(trending.KEY))
+
+        do_vote('q', self.questions[4].id, self.voters[0].id, 'up')
+        with self.assertNumQueries(1):
+            questions = Question.get_trending_question()
+        self.assertEqual([question.id for question in questions],
+                         [self.questions[4].id, self.questions[5].id])
+
+
+class HotScoreTest(TestCase):
+    """
+    Class for test hot score of questions:
+        -> score of new question
+        -> score is changed with votes and answers
+        -> refresh of scores
+        -> sorting by hot score
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.old_question = Question.objects.create(
+            question_title='Old title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now() - datetime.timedelta(days=10),
+            rating=50,
+            author=self.user1)
+
+        self.question = Question.objects.create(
+            question_title='New title',
+            question_text='four five six',
+            pub_date=timezone.now(),
+            author=self.user1)
+
+    def assertHotScore(self, question):
+        question = Question.objects.get(id=question.id)
+        self.assertAlmostEqual(question.hot_score, get_hot_score(
+            question.rating, question.answer_set.count(), question.pub_date))
+
+    def test_votes_and_answers(self):
+        self.assertHotScore(self.question)
+
+        do_vote('q', self.question.id, self.user2.id, 'up')
+        self.assertHotScore(self.question)
+
+        self.client.login(username=self.user2.username, password='notsosimple')
+        self.client.post(self.question.get_url(), {'Text': 'I got an answer'})
+        self.assertHotScore(self.question)
+
+        for vote_status in ('down', 'down'):
+            do_vote('q', self.question.id, self.user2.id, vote_status)
+            self.assertHotScore(self.question)
+
+    def test_refresh(self):
+        Question.objects.update(hot_score=0)
+
+        self.assertEqual(refresh_hot_scores(1), 2)
+        self.assertHotScore(self.question)
+        self.assertHotScore(self.old_question)
+
+    def test_sorting(self):
+        response = self.client.get('/paginate_data/', {'data': 'h'})
+        self.assertEqual(list(response.context['question_list_by_trend']),
+                         [self.question, self.old_question])
+        self.assertContains(response, "params.data = 'h';")
+
+        response = self.client.get('/paginate_data/', {'data': 't'})
+        self.assertEqual(list(response.context['question_list_by_trend']),
+                         [self.old_question, self.question])
+
+
+class IndexUsageTest(TestCase):
+    """
+    Class for test that queries of hot paths use indexes:
+        -> listings sorted by rating, date and hot score with cursor
+        -> answers of a question
+        -> votes of a user
+    """
+
+    def get_plan(self, queryset):
+        # Tables are small, so PostgreSQL should be forced to use indexes
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        return queryset.explain()
+
+    def test_listings(self):
+        position = Question(id=10, rating=1, pub_date=timezone.now(), hot_score=1)
+
+        for field, index in (('rating', 'question_rating_idx'),
+                             ('pub_date', 'question_pub_date_idx'),
+                             ('hot_score', 'question_hot_score_idx')):
+            paginator = CursorPaginator(Question.get_listing_queryset(), field, 8)
+            for cursor in (None, paginator.encode_cursor('n', position),
+                           paginator.encode_cursor('p', position)):
+                questions = paginator.get_queryset(
+                    paginator.decode_cursor(cursor) if cursor else None)
+                self.assertIn(index, self.get_plan(questions[:9]))
+
+    def test_answers(self):
+        answers = Answer.objects.filter(related_question_id=1).order_by('-rating')
+        self.assertIn('answer_question_rating_idx', self.get_plan(answers[:8]))
+
+    def test_votes(self):
+        for vote_class, index in ((VoteQuestion, 'unique_question_vote'),
+                                  (VoteAnswer, 'unique_answer_vote')):
+            if connection.vendor == 'sqlite':
+                index = 'sqlite_autoindex_{}_1'.format(vote_class._meta.db_table)
+
+            votes = vote_class.objects.filter(voter_id=1, text_field_id=1)
+            self.assertIn(index, self.get_plan(votes))
+
+
+@override_settings(FRAGMENT_CACHE='default')
+class FragmentCacheTest(TestCase):
+    """
+    Class for test cached fragments of listings and answers:
+        -> repeated request of a fragment does not query the database
+        -> vote for a question renders listing again
+        -> vote for an answer renders answers of its question again
+        -> new answer renders listing and answers again
+        -> fragments, pages and ETags are not cached without FRAGMENT_CACHE
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.question = Question.objects.create(
+            question_title='Simple title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.user1)
+
+        self.answer = Answer.objects.create(
+            answer_text='Doo roo ran ron',
+            related_question=self.question,
+            pub_date=timezone.now(),
+            author=self.user1)
+
+        self.answers_params = {'question_id': self.question.id, 'page': 1,
+                               'is_authenticated': 'True'}
+
+    def test_listing(self):
+        response = self.client.get('/paginate_data/', {'data': 't'})
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.client.get('/paginate_data/', {'data': 't'}).content, response.content)
+
+        do_vote('q', self.question.id, self.user2.id, 'up')
+        self.assertNotEqual(
+            self.client.get('/paginate_data/', {'data': 't'}).content, response.content)
+
+    def test_answers(self):
+        response = self.client.get('/get_answers/', self.answers_params)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.client.get('/get_answers/', self.answers_params).content,
+                response.content)
+
+        do_vote('a', self.answer.id, self.user2.id, 'up')
+        self.assertNotEqual(
+            self.client.get('/get_answers/', self.answers_params).content, response.content)
+
+    @override_settings(FRAGMENT_CACHE=None)
+    def test_disabled(self):
+        response = self.client.get('/paginate_data/', {'data': 't'})
+        with self.assertNumQueries(3):
+            self.assertEqual(
+                self.client.get('/paginate_data/', {'data': 't'}).content, response.content)
+        self.assertNotIn('ETag', self.client.get(self.question.get_url()))
+
+        # Version is not kept, so changes in other processes are seen at once
+        Question.objects.filter(id=self.question.id).update(question_title='Changed title')
+        self.assertContains(self.client.get('/paginate_data/', {'data': 't'}), 'Changed title')
+
+    def test_new_answer(self):
+        listing = self.client.get('/paginate_data/', {'data': 'd'})
+        answers = self.client.get('/get_answers/', self.answers_params)
+
+        self.client.login(username=self.user2.username, password='notsosimple')
+        self.client.post(self.question.get_url(), {'Text': 'Second answer'})
+
+        self.assertNotEqual(
+            self.client.get('/paginate_data/', {'data': 'd'}).content, listing.content)
+        self.assertNotEqual(
+            self.client.get('/get_answers/', self.answers_params).content, answers.content)
+
+
+class UserProfileTest(TestCase):
+    """
+    Class for test that profiles are created with users, not on read:
+        -> signup creates profile
+        -> listing with author without profile does not write
+        -> missing profiles are created by command
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        Question.objects.create(
+            question_title='Simple title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.user)
+
+    def test_signup(self):
+        self.client.post('/signup/', {'username': 'averagejoe', 'email': 'joe@average.com',
+                                      'password1': 'notsosimple', 'password2': 'notsosimple'})
+        self.assertTrue(UserProfile.objects.filter(user__username='averagejoe').exists())
+
+    def test_read_without_profile(self):
+        UserProfile.objects.all().delete()
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(UserProfile.get_profile(self.user.id))
+
+        self.client.get('/paginate_data/', {'data': 'd'})
+        self.client.get(Question.objects.get().get_url())
+        self.assertFalse(UserProfile.objects.exists())
+
+    def test_create_profiles(self):
+        UserProfile.objects.all().delete()
+        out = StringIO()
+        call_command('create_profiles', stdout=out)
+        self.assertTrue(UserProfile.objects.filter(user=self.user).exists())
+        self.assertIn('Created {} profiles'.format(User.objects.count()), out.getvalue())
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """
+    Email backend for test of retries, every message fails
+    """
+
+    def send_messages(self, email_messages):
+        raise ConnectionError('SMTP is not available')
+
+
+class UnavailableEmailBackend(BaseEmailBackend):
+    """
+    Email backend for test of retries, connection is not opened
+    """
+
+    def open(self):
+        raise ConnectionRefusedError('SMTP is not available')
+
+    def send_messages(self, email_messages):
+        return len(email_messages)
+
+
+class CountingEmailBackend(EmailBackend):
+    """
+    Email backend for test of digests, it counts opened connections
+    """
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+@override_settings(EMAIL_HOST_USER='hasker',
+                   EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class NotificationTest(TestCase):
+    """
+    Class for test queue of email notifications:
+        -> answer only enqueues notification
+        -> worker sends notification and removes it from the queue
+        -> jobs are claimed by one worker only
+        -> failed sending is retried with backoff and then marked as failed
+        -> failed connection retries all claimed jobs
+        -> digest groups answers of every author in one email
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.question = Question.objects.create(
+            question_title='Simple title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.user1)
+
+        self.client.login(username=self.user2.username, password='notsosimple')
+
+    def test_send(self):
+        self.client.post(self.question.get_url(), {'Text': 'I got an answer'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(AnswerNotification.objects.count(), 1)
+
+        call_command('send_notifications', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.user1.email])
+        self.assertFalse(AnswerNotification.objects.exists())
+
+    def test_claim(self):
+        for i in range(3):
+            self.client.post(self.question.get_url(), {'Text': 'Answer {}'.format(i)})
+
+        first, second = notifications.claim(2), notifications.claim(2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({job.id for job in first} & {job.id for job in second})
+        self.assertEqual(notifications.claim(2), [])
+
+    @override_settings(EMAIL_BACKEND='questions.tests.FailingEmailBackend',
+                       NOTIFICATION_MAX_ATTEMPTS=2)
+    def test_retry(self):
+        self.client.post(self.question.get_url(), {'Text': 'I got an answer'})
+
+        with self.assertLogs('questions.notifications', 'ERROR'):
+            self.assertEqual(notifications.send_notifications(10), (0, 1))
+        job = AnswerNotification.objects.get()
+        self.assertEqual((job.status, job.attempts), (AnswerNotification.PENDING, 1))
+        self.assertGreater(job.run_after, timezone.now())
+
+        # Job waits for backoff delay
+        self.assertEqual(notifications.send_notifications(10), (0, 0))
+
+        AnswerNotification.objects.update(run_after=timezone.now())
+        with self.assertLogs('questions.notifications', 'ERROR'):
+            self.assertEqual(notifications.send_notifications(10), (0, 1))
+        self.assertEqual(AnswerNotification.objects.get().status, AnswerNotification.FAILED)
+
+    @override_settings(EMAIL_BACKEND='questions.tests.UnavailableEmailBackend')
+    def test_connection_failure(self):
+        for i in range(2):
+            self.client.post(self.question.get_url(), {'Text': 'Answer {}'.format(i)})
+
+        with self.assertLogs('questions.notifications', 'ERROR'):
+            call_command('send_notifications', stdout=StringIO())
+
+        for job in AnswerNotification.objects.all():
+            self.assertEqual((job.status, job.attempts), (AnswerNotification.PENDING, 1))
+            self.assertIn('ConnectionRefusedError', job.last_error)
+            self.assertGreater(job.run_after, timezone.now())
+
+    @override_settings(EMAIL_BACKEND='questions.tests.CountingEmailBackend',
+                       NOTIFICATION_DIGEST=True)
+    def test_digest(self):
+        other_question = Question.objects.create(
+            question_title='Other title',
+            question_text='Blah blah blah four five six',
+            pub_date=timezone.now(),
+            author=self.user1)
+
+        for question in (self.question, other_question, self.question):
+            self.client.post(question.get_url(), {'Text': 'Answer <b>bold</b>'})
+
+        self.client.login(username=self.user1.username, password='nobodyknows')
+        self.client.post(Question.objects.create(
+            question_title='Question of joe',
+            question_text='Blah blah blah seven eight',
+            pub_date=timezone.now(),
+            author=self.user2).get_url(), {'Text': 'Answer for joe'})
+
+        # Nothing is due during the window
+        self.assertEqual(notifications.send_notifications(10), (0, 0))
+
+        # Due notification takes all answers of its author with it
+        AnswerNotification.objects.filter(
+            id__in=[AnswerNotification.objects.earliest('id').id,
+                    AnswerNotification.objects.latest('id').id]
+        ).update(run_after=timezone.now())
+        CountingEmailBackend.opened = 0
+        self.assertEqual(notifications.send_notifications(10), (4, 0))
+        self.assertEqual(CountingEmailBackend.opened, 1)
+
+        digest, = [msg for msg in mail.outbox if msg.to == [self.user1.email]]
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('Other title', digest.alternatives[0][0])
+        self.assertIn('&lt;b&gt;bold', digest.alternatives[0][0])
+        self.assertFalse(AnswerNotification.objects.exists())
+
+
+class CreateQuestionTest(TestCase):
+    """
+    Class for test tags of new question:
+        -> tags are normalized, existing tags are reused
+        -> number of queries does not depend on number of tags
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.client.login(username='johndoe', password='nobodyknows')
+        Tag.objects.create(tag_text='old tag')
+
+    def ask(self, tags):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post('/ask/', {'title': 'some title',
+                                       'text': 'nobody knows this text',
+                                       'tags': tags})
+        return len(queries)
+
+    def test_tags(self):
+        self.ask(' old   tag , new tag,,new tag, ' + 'x' * 40)
+
+        question = Question.objects.get()
+        self.assertEqual({tag.tag_text for tag in question.get_tags()},
+                         {'old tag', 'new tag', 'x' * 30})
+        self.assertEqual(Tag.objects.count(), 3)
+
+    def test_queries(self):
+        self.assertEqual(self.ask('tag1'),
+                         self.ask(', '.join('tag{}'.format(i) for i in range(10))))
+
+
+@override_settings(FRAGMENT_CACHE='default')
+class ConditionalGetTest(TestCase):
+    """
+    Class for test ETag of question page and answers:
+        -> unchanged question is answered with 304 Not Modified
+        -> vote, answer and right answer change ETag
+        -> change of profiles changes ETag of question page
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.question = Question.objects.create(
+            question_title='Simple title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.user1)
+
+        self.answer = Answer.objects.create(
+            answer_text='Doo roo ran ron',
+            related_question=self.question,
+            pub_date=timezone.now(),
+            author=self.user2)
+
+        self.client.login(username=self.user1.username, password='nobodyknows')
+
+    def assertNotModified(self, url, params=None):
+        # The first response sets CSRF cookie
+        self.client.get(url, params)
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        etag = response['ETag']
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        return etag
+
+    def test_question_page(self):
+        url = self.question.get_url()
+        etag = self.assertNotModified(url)
+
+        do_vote('q', self.question.id, self.user2.id, 'up')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         HTTPStatus.OK)
+
+        # Page has user in it
+        etag = self.assertNotModified(url)
+        self.client.logout()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         HTTPStatus.OK)
+
+        # Avatars of authors are on the page
+        self.client.login(username=self.user1.username, password='nobodyknows')
+        etag = self.assertNotModified(url)
+        fragments.bump(fragments.PROFILES)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         HTTPStatus.OK)
+
+    @override_settings(VOTE_BUFFER=True, VOTE_BUFFER_FLUSH_INTERVAL=None)
+    def test_buffered_answer_vote(self):
+        url = self.question.get_url()
+        etag = self.assertNotModified(url)
+
+        do_vote('a', self.answer.id, self.user1.id, 'up')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         HTTPStatus.OK)
+
+    def test_answers(self):
+        params = {'question_id': self.question.id, 'page': 1, 'is_authenticated': 'True'}
+
+        for change in (lambda: do_vote('a', self.answer.id, self.user1.id, 'up'),
+                       lambda: Question.change_right_answer(
+                           self.answer.id, 'false', self.user1.id)):
+            etag = self.assertNotModified('/get_answers/', params)
+            change()
+            response = self.client.get('/get_answers/', params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_version(self):
+        version = Question.objects.get().version
+
+        do_vote('a', self.answer.id, self.user1.id, 'up')
+        Question.change_right_answer(self.answer.id, 'false', self.user1.id)
+        self.client.post(self.question.get_url(), {'Text': 'I got an answer'})
+
+        self.assertEqual(Question.objects.get().version, version + 3)
+
+
+@override_settings(FRAGMENT_CACHE='default')
+class PageCacheTest(TestCase):
+    """
+    Class for test cached pages with holes for user:
+        -> anonymous user gets cached page without queries
+        -> authenticated user gets the same page with his or her holes
+        -> vote for the question renders its page again
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.question = Question.objects.create(
+            question_title='Simple title',
+            question_text='Blah blah blah one two three',
+            pub_date=timezone.now(),
+            author=self.user1)
+
+    def test_anonymous(self):
+        response = self.client.get('/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/').content, response.content)
+
+        # Only version of the question is checked for ETag
+        response = self.client.get(self.question.get_url())
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.question.get_url()).content,
+                             response.content)
+
+        self.assertContains(response, 'Log in')
+        self.assertNotContains(response, 'answer-form-id')
+
+    def test_holes(self):
+        self.client.get(self.question.get_url())
+        self.client.login(username=self.user2.username, password='notsosimple')
+
+        response = self.client.get(self.question.get_url())
+        self.assertContains(response, 'Sign out')
+        self.assertContains(response, 'answer-form-id')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(
+            response, '<div id="user-id-field" style="display:none">{}</div>'.format(
+                self.user2.id))
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_vote(self):
+        self.client.get(self.question.get_url())
+        do_vote('q', self.question.id, self.user2.id, 'up')
+
+        response = self.client.get(self.question.get_url())
+        self.assertContains(response, '<div id="q_{}">1</div>'.format(self.question.id))
+
+
+class ExportTest(TestCase):
+    """
+    Class for test export command:
+        -> questions with tags, answers and votes are exported
+        -> since exports only changed questions with their answers and votes
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.tag = Tag.objects.create(tag_text='move')
+
+        self.questions = []
+        for i in range(3):
+            question = Question.objects.create(
+                question_title='Title {}'.format(i),
+                question_text='Blah blah blah {}'.format(i),
+                pub_date=timezone.now() - datetime.timedelta(days=10),
+                updated_at=timezone.now() - datetime.timedelta(days=10),
+                author=self.user1)
+            question.question_tags.add(self.tag)
+            self.questions.append(question)
+
+        self.answer = Answer.objects.create(
+            answer_text='Doo roo ran ron',
+            related_question=self.questions[0],
+            pub_date=timezone.now(),
+            author=self.user2)
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export', chunk_size=2, stdout=out, **options)
+        return [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_export(self):
+        do_vote('a', self.answer.id, self.user1.id, 'up')
+        records = self.export()
+
+        self.assertEqual([record['type'] for record in records],
+                         ['question'] * 3 + ['answer', 'answer_vote'])
+        self.assertEqual([record['id'] for record in records[:3]],
+                         [question.id for question in self.questions])
+        self.assertEqual(records[2]['question_tags'], ['move'])
+
+    def test_since(self):
+        do_vote('q', self.questions[1].id, self.user2.id, 'up')
+        records = self.export(since=(timezone.now() - datetime.timedelta(days=1)).isoformat())
+
+        self.assertEqual([(record['type'], record['id']) for record in records],
+                         [('question', self.questions[1].id),
+                          ('question_vote', VoteQuestion.objects.get().id)])
+
+
+class ImportTest(TestCase):
+    """
+    Class for test import_qa command:
+        -> records written by export are imported with their ids, tags and votes
+        -> CSV with usernames creates users and their profiles
+        -> record of unknown type stops import
+        -> question with id which exists stops import, existing one is not changed
+    """
+
+    def setUp(self):
+        self.user1 = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        self.user2 = User.objects.create_user(
+            username='averagejoe',
+            email='joe@average.com',
+            password='notsosimple')
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def import_qa(self, *paths, **options):
+        call_command('import_qa', *paths, batch=2, stdout=StringIO(), **options)
+
+    def test_import_export(self):
+        question = Question.objects.create(
+            question_title='Title',
+            question_text='Blah blah blah',
+            pub_date=timezone.now(),
+            rating=1,
+            author=self.user1)
+        question.question_tags.add(Tag.objects.create(tag_text='move'))
+        answer = Answer.objects.create(
+            answer_text='Doo roo ran ron',
+            related_question=question,
+            pub_date=timezone.now(),
+            author=self.user2)
+        do_vote('a', answer.id, self.user1.id, 'up')
+
+        out = StringIO()
+        call_command('export', stdout=out)
+        Question.objects.all().delete()
+        Tag.objects.all().delete()
+
+        self.import_qa(self.write('export.ndjson', out.getvalue()))
+
+        question = Question.objects.get(id=question.id)
+        self.assertEqual(question.rating, 1)
+        self.assertEqual([tag.tag_text for tag in question.question_tags.all()], ['move'])
+        self.assertEqual(Answer.objects.get(id=answer.id).rating, 1)
+        self.assertTrue(VoteAnswer.objects.filter(text_field_id=answer.id, up=True).exists())
+
+        # Sequence continues after imported ids
+        self.assertGreater(Question.objects.create(
+            question_title='New', question_text='New', pub_date=timezone.now(),
+            author=self.user1).id, question.id)
+
+    def test_import_csv(self):
+        path = self.write('questions.csv', (
+            'type,id,author,question_title,question_text,pub_date,question_tags,'
+            'related_question_id,answer_text,right\n'
+            'question,10,johndoe,Title 1,Text 1,2021-01-01T10:00:00+00:00,"move, Jump",,,\n'
+            'question,11,newcomer,Title 2,Text 2,2021-01-02T10:00:00+00:00,move,,,\n'
+            'answer,,newcomer,,,2021-01-03T10:00:00+00:00,,10,Answer,True\n'))
+
+        with CaptureQueriesContext(connection) as context:
+            self.import_qa(path)
+        self.assertLess(len(context.captured_queries), 40)
+
+        self.assertEqual(sorted(Question.objects.get(id=10).question_tags.values_list(
+            'tag_text', flat=True)), ['Jump', 'move'])
+        self.assertEqual(Tag.objects.count(), 2)
+        answer = Answer.objects.get()
+        self.assertEqual((answer.author.username, answer.right), ('newcomer', True))
+        self.assertIsNotNone(UserProfile.get_profile(answer.author))
+
+    def test_existing_id(self):
+        question = Question.objects.create(
+            question_title='Title',
+            question_text='Blah blah blah',
+            pub_date=timezone.now(),
+            author=self.user1)
+        path = self.write('legacy.ndjson', '\n'.join(json.dumps(record) for record in (
+            {'type': 'question', 'id': question.id, 'author_id': self.user2.id,
+             'question_title': 'Legacy', 'question_text': 'Legacy text',
+             'pub_date': '2021-01-01T10:00:00+00:00', 'question_tags': ['legacy-tag']},
+            {'type': 'answer', 'related_question_id': question.id,
+             'author_id': self.user2.id, 'answer_text': 'legacy answer',
+             'pub_date': '2021-01-02T10:00:00+00:00'},
+        )))
+
+        with self.assertRaisesRegex(CommandError, 'already exist'):
+            self.import_qa(path)
+
+        question = Question.objects.get(id=question.id)
+        self.assertEqual(question.question_title, 'Title')
+        self.assertFalse(question.question_tags.exists())
+        self.assertFalse(Answer.objects.exists())
+
+    def test_unknown_type(self):
+        path = self.write('bad.ndjson', '{"type": "comment"}\n')
+
+        with self.assertRaises(CommandError):
+            self.import_qa(path)
+
+
+class BenchmarkTest(TestCase):
+    """
+    Class for test synthetic data and benchmark of views:
+        -> seed_synthetic writes users, questions with popular tags, answers and votes
+        -> every URL is requested within query budget of its view
+        -> view over budget fails benchmark
+        -> benchmark removes its user and does not touch caches of the site
+    """
+
+    def setUp(self):
+        call_command('seed_synthetic', users=10, questions=30, answers=3, votes=3, tags=20,
+                     seed=1, stdout=StringIO())
+
+    def benchmark(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            call_command('benchmark_views', repeat=2, stdout=StringIO())
+
+    def test_seed_synthetic(self):
+        self.assertEqual(Question.objects.count(), 30)
+        self.assertEqual(UserProfile.objects.count(), 10)
+        self.assertTrue(Answer.objects.exists())
+        self.assertTrue(VoteQuestion.objects.exists())
+
+        question = Question.objects.filter(votequestion__isnull=False).first()
+        self.assertEqual(question.rating, sum(
+            1 if vote.up else -1 for vote in question.votequestion_set.all()))
+
+        # The first tag of Zipf distribution is the most popular
+        tags = Tag.objects.annotate(number=models.Count('question')).order_by('-number')
+        self.assertEqual(tags[0].tag_text, 'tag1')
+
+    def test_budgets(self):
+        with benchmark.Benchmark(1) as runner:
+            self.assertEqual(benchmark.get_missing(runner.get_endpoints()), [])
+        self.benchmark()
+
+    def test_cleanup(self):
+        users = User.objects.count()
+        caches['default'].set('site', 1)
+
+        self.benchmark()
+        self.assertEqual(User.objects.count(), users)
+        self.assertEqual(caches['default'].get('site'), 1)
+
+    @override_settings(BENCHMARK_QUERY_BUDGETS={'questions:question_info': 0})
+    def test_over_budget(self):
+        with self.assertRaisesRegex(CommandError, r'questions:question_info: \d+ queries, '
+                                                  r'budget is 0'):
+            self.benchmark()
+
+
+class LoadTestTest(TestCase):
+    """
+    Class for test load of the WSGI application:
+        -> every action of the mix is done without errors
+        -> unknown action in mix stops load test
+    """
+
+    def setUp(self):
+        call_command('seed_synthetic', users=5, questions=10, answers=1, votes=1, tags=5,
+                     seed=1, stdout=StringIO())
+
+    def test_load(self):
+        answers = Answer.objects.count()
+        config = loadtest.get_config(None, loadtest.DEFAULT_MIX, 3)
+        samples, lock_errors, _ = loadtest.run(config, processes=1, threads=1, duration=1)
+
+        statistics = loadtest.get_statistics(samples)
+        self.assertEqual([action for action, *_ in statistics],
+                         ['answer', 'index', 'question', 'search', 'vote'])
+        self.assertEqual(sum(errors for _, _, errors, *_ in statistics), 0)
+        self.assertEqual(lock_errors, 0)
+        self.assertEqual(Answer.objects.count() - answers,
+                         len([sample for sample in samples if sample.action == 'answer']))
+
+    def test_unknown_action(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown action: browse'):
+            call_command('loadtest', mix='index=1,browse=1', stdout=StringIO())
+
+
+class MetricsTest(TestCase):
+    """
+    Class for test metrics of views:
+        -> requests, SQL queries, rendering and size are counted by name of view
+        -> metrics of all processes are summed
+        -> threads flush metrics at the same time without errors
+        -> failure of metrics does not fail the request
+        -> metrics are not shown to other hosts
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(METRICS_DIR=directory.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        # Metrics of this process start from zero
+        metrics._store = None
+
+    def test_metrics(self):
+        self.client.get('/paginate_data/', {'data': 't'})
+        self.client.get('/paginate_data/', {'data': 'd'})
+        self.client.get('/rest/index/')
+
+        content = self.client.get('/metrics').content.decode()
+
+        self.assertIn('hasker_requests_total{view="questions:paginate_data",method="GET",'
+                      'status="200"} 2', content)
+        self.assertIn('hasker_requests_total{view="api:index",method="GET",status="200"} 1',
+                      content)
+        self.assertIn('hasker_request_duration_seconds_bucket{view="api:index",le="+Inf"} 1',
+                      content)
+        self.assertIn('hasker_db_queries_total{view="questions:paginate_data"}', content)
+
+        render_time = [line for line in content.splitlines() if line.startswith(
+            'hasker_template_render_seconds_total{view="questions:paginate_data"}')]
+        self.assertGreater(float(render_time[0].split()[-1]), 0)
+
+    def test_processes(self):
+        self.client.get('/rest/index/')
+
+        # File of other process (e.g. gunicorn worker)
+        with open(os.path.join(settings.METRICS_DIR, '1.json'), 'w') as file:
+            json.dump({'counters': [['hasker_requests_total', ['api:index', 'GET', '200'], 4]],
+                       'histograms': []}, file)
+
+        self.assertContains(self.client.get('/metrics'), 'hasker_requests_total{view="api:index"'
+                                                          ',method="GET",status="200"} 5')
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    def test_concurrent_flush(self):
+        store = metrics.get_store()
+        errors = []
+
+        def observe():
+            try:
+                for _ in range(20):
+                    store.observe('api:index', 'GET', 200, 0.01, 1, 0.001, 0, 10)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [Thread(target=observe) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertContains(self.client.get('/metrics'), 'hasker_requests_total{view="api:index"'
+                                                          ',method="GET",status="200"} 200')
+        self.assertEqual(sorted(os.listdir(settings.METRICS_DIR)), ['{}.json'.format(os.getpid())])
+
+    def test_failure(self):
+        with override_settings(METRICS_DIR='/dev/null/metrics'), \
+                self.assertLogs('hasker.metrics', 'ERROR'):
+            response = self.client.get('/rest/index/')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_forbidden(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+class SlowQueryTest(TestCase):
+    """
+    Class for test slow query log:
+        -> queries over threshold are written with normalized text, view and place
+        -> fast queries are not written without sampling
+        -> slowqueries summarizes the log
+        -> log moved by logrotate is opened again, rotated files are read first
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = os.path.join(directory.name, 'slow.jsonl')
+
+    def test_slow_queries(self):
+        with override_settings(SLOW_QUERY_LOG=self.log, SLOW_QUERY_THRESHOLD=0):
+            self.client.get('/get_search/', {'search': 'tag:move', 'page': 1})
+            entries = list(slow_queries.iter_entries())
+
+            out = StringIO()
+            call_command('slowqueries', by='frame', stdout=out)
+
+        self.assertTrue(entries)
+        self.assertTrue(all(entry['view'] == 'questions:get_search' for entry in entries))
+        self.assertIn('questions/models.py:get_search_result',
+                      [entry['frame'] for entry in entries])
+        self.assertTrue(all("'move'" not in entry['sql'] for entry in entries))
+        self.assertIn('questions/models.py:get_search_result', out.getvalue())
+
+    def test_fast_queries(self):
+        with override_settings(SLOW_QUERY_LOG=self.log, SLOW_QUERY_THRESHOLD=10,
+                               SLOW_QUERY_SAMPLE_RATE=0):
+            self.client.get('/get_search/', {'search': 'tag:move', 'page': 1})
+            self.assertEqual(list(slow_queries.iter_entries()), [])
+
+    def test_rotated(self):
+        with override_settings(SLOW_QUERY_LOG=self.log, SLOW_QUERY_THRESHOLD=0):
+            slow_queries.write_entry('SELECT 1', 1, 'old', True)
+            os.rename(self.log, self.log + '.1')
+            slow_queries.write_entry('SELECT 2', 1, 'new', True)
+
+            self.assertTrue(os.path.exists(self.log))
+            self.assertEqual([entry['view'] for entry in slow_queries.iter_entries()],
+                             ['old', 'new'])
+
+    def test_normalize(self):
+        self.assertEqual(slow_queries.normalize(
+            'SELECT "id" FROM "t1"\n WHERE "id" IN (1, 2, 3) AND "text" = \'it\'\'s\' LIMIT 8'),
+            'SELECT "id" FROM "t1" WHERE "id" IN (...) AND "text" = ? LIMIT ?')
+
+
+class ProfilerTest(TestCase):
+    """
+    Class for test profiler of views:
+        -> staff user with X-Profile header gets summary, stats and SQL are written
+        -> header of other user is ignored
+        -> sampled requests are profiled without summary
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='johndoe',
+            email='johndoe@somemail.mail',
+            password='nobodyknows')
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_override = override_settings(PROFILE_DIR=directory.name)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def get_files(self):
+        if not os.path.isdir(settings.PROFILE_DIR):
+            return []
+        return sorted(os.listdir(settings.PROFILE_DIR))
+
+    def test_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.login(username='johndoe', password='nobodyknows')
+
+        response = self.client.get('/get_search/', {'search': 'tag:move', 'page': 1},
+                                   HTTP_X_PROFILE='1')
+
+        summary = response[profiler.RESPONSE_HEADER]
+        self.assertIn('queries=', summary)
+        name = summary.split('profile=')[1]
+        self.assertEqual(self.get_files(), [name + '.prof', name + '.sql.json'])
+
+        path = os.path.join(settings.PROFILE_DIR, name)
+        self.assertTrue(pstats.Stats(path + '.prof').total_calls > 0)
+        with open(path + '.sql.json') as file:
+            data = json.load(file)
+        self.assertEqual(data['view'], 'questions:get_search')
+        self.assertIn('questions/models.py:get_search_result',
+                      [':'.join(query['frame'].split(':')[:2]) for query in data['queries']])
+
+    def test_not_staff(self):
+        self.client.login(username='johndoe', password='nobodyknows')
+
+        response = self.client.get('/trending_data/', HTTP_X_PROFILE='1')
+
+        self.assertFalse(response.has_header(profiler.RESPONSE_HEADER))
+        self.assertEqual(self.get_files(), [])
+
+    @override_settings(PROFILE_SAMPLE_RATE=1)
+    def test_sample(self):
+        response = self.client.get('/trending_data/')
+
+        self.assertFalse(response.has_header(profiler.RESPONSE_HEADER))
+        self.assertEqual(len(self.get_files()), 2)
@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.cache import caches
+
+from . import vote_buffer
+
+# ******************** CACHE KEYS ********************#
+KEY = 'trending'
+LOCK_KEY = 'trending:lock'
+
+
+# ********************* FUNCTIONS ********************#
+
+def get_cache():
+    """
+    :return: cache with list of trending questions
+    """
+    return caches[settings.TRENDING_CACHE]
+
+
+def is_enabled():
+    """
+    :return: True if the list is cached. It is updated on votes by the process
+             which got the vote, so TRENDING_CACHE must be shared by all
+             processes (redis, memcached), it is None by default
+    """
+    return settings.TRENDING_CACHE is not None
+
+
+def get_size():
+    """
+    :return: number of cached questions, there are more of them than
+             settings.TRENDING_BATCH, so question which leaves the top
+             does not require rebuild of the list
+    """
+    return settings.TRENDING_BATCH * settings.TRENDING_CACHE_FACTOR
+
+
+def sort_key(entry):
+    """
+    :param entry: [id, question_title, rating]
+    :return: key to sort entries by rating and then by id in descending order
+    """
+    return -entry[2], -entry[0]
+
+
+def rebuild():
+    """
+    :return: state of cached list with top questions from the database
+
+    State is a dict:
+        entries    -> list of [id, question_title, rating] sorted by sort_key
+        exhaustive -> True if there are no other questions in the database
+    """
+    from .models import Question
+
+    size = get_size()
+    entries = [list(row) for row in Question.objects.order_by(
+        '-rating', '-id').values_list('id', 'question_title', 'rating')[:size + 1]]
+
+    if settings.VOTE_BUFFER:
+        pending = vote_buffer.get_pending('q', [entry[0] for entry in entries])
+        for entry in entries:
+            entry[2] += pending.get(entry[0], 0)
+        entries.sort(key=sort_key)
+
+    state = {'entries': entries[:size], 'exhaustive': len(entries) <= size}
+    if is_enabled():
+        get_cache().set(KEY, state, settings.TRENDING_TIMEOUT)
+
+    return state
+
+
+def get_trending():
+    """
+    :return: settings.TRENDING_BATCH most voted questions, only id, title
+             and rating of the questions are available
+
+    Cached list is eventually consistent: update which loses the race for the
+    lock invalidates the list, and the list is rebuilt from the database at
+    least every settings.TRENDING_TIMEOUT seconds
+    """
+    from .models import Question
+
+    state = get_cache().get(KEY) if is_enabled() else None
+    if state is None or (len(state['entries']) < settings.TRENDING_BATCH and
+                         not state['exhaustive']):
+        state = rebuild()
+
+    return [Question(id=id_, question_title=question_title, rating=rating)
+            for id_, question_title, rating in state['entries'][:settings.TRENDING_BATCH]]
+
+
+def invalidate():
+    """
+    Remove cached list, it is rebuilt on next request
+    """
+    if is_enabled():
+        get_cache().delete(KEY)
+
+
+def update_question(question_id, rating, question_title=None):
+    """
+    :param question_id: id of voted, new or deleted question
+    :param rating: new rating of the question or None if it is deleted
+    :param question_title: title of new question
+
+    Questions which are not cached have lower rating than the last cached one.
+    So question enters the list only if its rating becomes higher than rating of
+    the last cached question and leaves the list if it becomes lower.
+    If list is changed concurrently it is invalidated.
+    """
+    from .models import Question
+
+    if not is_enabled():
+        return
+
+    cache = get_cache()
+    if not cache.add(LOCK_KEY, True, timeout=settings.TRENDING_LOCK_TIMEOUT):
+        invalidate()
+        return
+
+    try:
+        state = cache.get(KEY)
+        if state is None:
+            return
+
+        question_id = int(question_id)
+        entries = [entry for entry in state['entries'] if entry[0] != question_id]
+
+        if rating is not None:
+            titles = {entry[0]: entry[1] for entry in state['entries']}
+            entry = [question_id, question_title or titles.get(question_id), rating]
+            last = state['entries'][-1] if state['entries'] else None
+
+            if state['exhaustive'] or (last and sort_key(entry) <= sort_key(last)):
+                # Title is not known only if question enters the list
+                if entry[1] is None:
+                    entry[1] = Question.objects.values_list(
+                        'question_title', flat=True).get(id=question_id)
+
+                entries.append(entry)
+                entries.sort(key=sort_key)
+
+        if len(entries) > get_size():
+            entries = entries[:get_size()]
+            state['exhaustive'] = False
+
+        state['entries'] = entries
+
+        # List could be invalidated by concurrent update which did not get the lock
+        if cache.get(KEY) is not None:
+            cache.set(KEY, state, settings.TRENDING_TIMEOUT)
+
+    finally:
+        cache.delete(LOCK_KEY)
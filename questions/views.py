@@ -3,18 +3,21 @@ from http import HTTPStatus
 from django.conf import settings
 from django.contrib.auth import logout, views, forms
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from django.template.loader import render_to_string
 from django.views import generic
 from django.views.decorators.http import require_GET
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 
+from . import fragments, vote_buffer
+from .conditional import question_condition
 from .forms import AnswerForm, AskForm, QuestionSignUpForm, UserProfileForm
 from .models import do_vote, Answer, Question, UserProfile
 
 
+@method_decorator(fragments.cache_page_shell(), name='dispatch')
 class IndexView(generic.TemplateView):
     """
     Template for home/index page of the Hasker
@@ -22,6 +25,7 @@ class IndexView(generic.TemplateView):
     template_name = 'questions/index.html'
 
 
+@method_decorator(fragments.cache_page_shell(), name='dispatch')
 class SearchView(generic.TemplateView):
     """
     Template for search query. Search can be by tags or by words.
@@ -83,7 +87,8 @@ def change_settings(request):
         form = UserProfileForm(request.POST, request.FILES)
 
         if form.is_valid():
-            user_profile = UserProfile.get_profile(user_id=request.user.id)
+            user_profile = UserProfile.get_profile(user_id=request.user.id) or \
+                UserProfile.objects.create(user=request.user)
             user_profile.update_profile(request.POST.get("email"),
                                         request.FILES.get("avatar"))
             return redirect(reverse_lazy('settings'))
@@ -130,6 +135,10 @@ def error_404(_):
     return response
 
 
+@question_condition(lambda request, question_id, question_enc: question_id, per_user=True)
+@fragments.cache_page_shell(
+    lambda request, question_id, question_enc: fragments.question_version(question_id),
+    fragments.PROFILES)
 def get_question_info(request, question_id, question_enc):
     """
     :param request: HTTP request
@@ -139,7 +148,8 @@ def get_question_info(request, question_id, question_enc):
              add new answer for a question in case of POST request
     """
     try:
-        question = Question.objects.get(id=question_id)
+        question = Question.objects.select_related(
+            'author', 'author__userprofile').get(id=question_id)
 
     except Question.DoesNotExist:
         return error_404('')
@@ -148,6 +158,8 @@ def get_question_info(request, question_id, question_enc):
         Answer.create_answer(request, question)
         return redirect(request.path)
 
+    question, = vote_buffer.merge_pending('q', [question])
+
     return render(request, 'questions/question.html',
                   {'question': question, 'form': AnswerForm})
 
@@ -167,6 +179,9 @@ def get_search_questions(request):
 
 
 @require_GET
+@fragments.cache_fragment(
+    lambda request: fragments.question_version(request.GET.get('question_id')),
+    fragments.PROFILES)
 def get_answers(request):
     """
     :param request: HTTP request async
@@ -197,38 +212,35 @@ def mark_answer(request):
 
 
 @require_GET
+@fragments.cache_fragment(fragments.QUESTIONS, fragments.PROFILES)
 def paginate_data(request):
     """
-    :param request: request with page and data parameters
+    :param request: request with cursor (or page) and data parameters
             data == 'd' --> date values
             data == 't' --> trend values
+            data == 'h' --> hot score values
     :return: HTTP response with rendered in html format content
             of <div> element
     """
     paginate_by = request.GET.get('data')
-
-    # Get right sorting
-    questions = Question.objects.order_by('-{by}'.format(
-        by='pub_date' if paginate_by == 'd' else 'rating'))
-
-    # Create Paginator
-    paginator = Paginator(questions, settings.BATCH_ON_PAGE)
-    page = request.GET.get('page')
+    questions, page = Question.get_listing_page(request, settings.BATCH_ON_PAGE)
 
     if paginate_by == 'd':
-        question_list_by_date = paginator.get_page(page)
+        question_list_by_date = questions
         return render(request, 'questions/render/date_list_render.html',
                       {'question_list_by_date': question_list_by_date,
                        'page': page})
 
     else:
-        question_list_by_trend = paginator.get_page(page)
+        question_list_by_trend = questions
         return render(request, 'questions/render/trend_list_render.html',
                       {'question_list_by_trend': question_list_by_trend,
-                       'page': page})
+                       'page': page,
+                       'data': 'h' if paginate_by == 'h' else 't'})
 
 
 @require_GET
+@fragments.cache_fragment(fragments.QUESTIONS)
 def trending_data(_):
     """
     :return: render of html formatted data of top question by votes
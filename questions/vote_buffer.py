@@ -0,0 +1,296 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, models, transaction
+
+from . import fragments
+
+logger = logging.getLogger(__name__)
+
+# ******************** CACHE KEYS ********************#
+PREFIX = 'vote_buffer'
+SEQUENCE_KEY = PREFIX + ':sequence'
+FLUSHED_KEY = PREFIX + ':flushed'
+LOCK_KEY = PREFIX + ':lock'
+GAP_KEY = PREFIX + ':gap'
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+# ********************* FUNCTIONS ********************#
+
+def get_cache():
+    """
+    :return: cache which accumulates rating deltas
+    """
+    return caches[settings.VOTE_BUFFER_CACHE]
+
+
+def delta_key(question_or_answer, text_object_id):
+    """
+    :param question_or_answer:
+        'q' -> Question
+        'a' -> Answer
+    :param text_object_id: id of an answer or a question
+    :return: cache key of pending rating delta of an object
+    """
+    return '{prefix}:{q_or_a}:{id}'.format(
+        prefix=PREFIX, q_or_a=question_or_answer, id=text_object_id)
+
+
+def slot_key(number):
+    """
+    :return: cache key of a slot which marks an object as changed
+    """
+    return '{prefix}:slot:{number}'.format(prefix=PREFIX, number=number)
+
+
+def add_delta(question_or_answer, text_object_id, delta):
+    """
+    :param question_or_answer:
+        'q' -> Question
+        'a' -> Answer
+    :param text_object_id: id of an answer or a question
+    :param delta: change of rating
+
+    Add delta to the pending rating of an object and mark the object
+    in the next slot, so flusher can find it without scanning the table.
+    Key of the delta expires settings.VOTE_BUFFER_DELTA_TIMEOUT seconds after
+    the last vote, so keys drained by flush do not stay in the cache.
+    """
+    cache = get_cache()
+    key = delta_key(question_or_answer, text_object_id)
+
+    if not cache.add(key, 0, timeout=settings.VOTE_BUFFER_DELTA_TIMEOUT):
+        cache.touch(key, timeout=settings.VOTE_BUFFER_DELTA_TIMEOUT)
+    cache.incr(key, delta)
+
+    cache.add(SEQUENCE_KEY, 0, timeout=None)
+    cache.set(slot_key(cache.incr(SEQUENCE_KEY)), key, timeout=None)
+
+    start_flusher()
+
+
+def get_pending(question_or_answer, ids):
+    """
+    :param question_or_answer:
+        'q' -> Question
+        'a' -> Answer
+    :param ids: ids of answers or questions
+    :return: dict with pending rating delta for each id which has one
+    """
+    keys = {delta_key(question_or_answer, id_): id_ for id_ in ids}
+    return {keys[key]: delta
+            for key, delta in get_cache().get_many(list(keys)).items()
+            if delta}
+
+
+def merge_pending(question_or_answer, objects):
+    """
+    :param question_or_answer:
+        'q' -> Question
+        'a' -> Answer
+    :param objects: questions or answers
+    :return: objects with pending deltas added to their rating, so user
+             sees his or her vote before it is flushed to the database
+    """
+    if not settings.VOTE_BUFFER:
+        return objects
+
+    objects = list(objects)
+    pending = get_pending(question_or_answer, [obj.id for obj in objects])
+    for obj in objects:
+        obj.rating += pending.get(obj.id, 0)
+
+    return objects
+
+
+def is_lost(number):
+    """
+    :param number: number of a missing slot
+    :return: True if the slot is missing for more than settings.VOTE_BUFFER_LOCK_TIMEOUT
+             seconds, so it was lost (e.g. evicted), not yet written by add_delta
+
+    Sequence is incremented before the slot is written, so a flush can see
+    the number of a slot which is written a moment later
+    """
+    cache = get_cache()
+    gap = cache.get(GAP_KEY)
+    if gap is None or gap[0] != number:
+        cache.set(GAP_KEY, (number, time.time()), timeout=None)
+        return False
+
+    if time.time() - gap[1] < settings.VOTE_BUFFER_LOCK_TIMEOUT:
+        return False
+
+    logger.warning('Slot %s of vote buffer is lost, run flush_votes --all', number)
+    return True
+
+
+def flush():
+    """
+    :return: number of objects which rating was updated
+
+    Collect objects marked in slots since the last flush and apply their
+    pending deltas. Flush stops at the first missing slot and continues
+    from it next time. Only one flusher at a time is allowed to run.
+    """
+    cache = get_cache()
+    if not cache.add(LOCK_KEY, True, timeout=settings.VOTE_BUFFER_LOCK_TIMEOUT):
+        return 0
+
+    try:
+        last = cache.get(SEQUENCE_KEY, 0)
+        flushed = cache.get(FLUSHED_KEY, 0)
+
+        keys = set()
+        for start in range(flushed + 1, last + 1, settings.VOTE_BUFFER_BATCH):
+            numbers = range(start, min(start + settings.VOTE_BUFFER_BATCH, last + 1))
+            slots = cache.get_many([slot_key(number) for number in numbers])
+
+            done = []
+            for number in numbers:
+                key = slots.get(slot_key(number))
+                if key is None and not is_lost(number):
+                    break
+                if key is not None:
+                    keys.add(key)
+                done.append(slot_key(number))
+                flushed = number
+
+            cache.delete_many(done)
+            if len(done) < len(numbers):
+                break
+
+        cache.set(FLUSHED_KEY, flushed, timeout=None)
+        return flush_keys(keys)
+
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def flush_all():
+    """
+    :return: number of objects which rating was updated
+    :raise RuntimeError: if the buffer is flushed by other process for
+                         settings.VOTE_BUFFER_LOCK_TIMEOUT seconds
+
+    Check pending deltas of every question and answer. It is slow but it
+    also finds deltas which slots were lost (e.g. evicted from the cache).
+    It takes the lock of flush, so deltas are not applied twice.
+    """
+    from .models import Answer, Question
+
+    cache = get_cache()
+    deadline = time.monotonic() + settings.VOTE_BUFFER_LOCK_TIMEOUT
+    while not cache.add(LOCK_KEY, True, timeout=settings.VOTE_BUFFER_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise RuntimeError('Vote buffer is flushed by other process')
+        time.sleep(0.1)
+
+    try:
+        keys = set()
+        for question_or_answer, object_class in (('q', Question), ('a', Answer)):
+            ids = object_class.objects.values_list('id', flat=True).order_by('id')
+            for id_ in ids.iterator(chunk_size=settings.VOTE_BUFFER_BATCH):
+                keys.add(delta_key(question_or_answer, id_))
+
+        return flush_keys(keys)
+
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def flush_keys(keys):
+    """
+    :param keys: cache keys of pending deltas
+    :return: number of objects which rating was updated
+
+    Apply deltas with one UPDATE ... CASE statement for every batch of objects.
+    Delta is subtracted from the cache instead of deleting the key, so votes
+    which come during the flush are kept for the next one. Cache has no atomic
+    delete of a key which is 0, so drained keys expire instead. Versions of
+    questions of flushed answers are bumped, so their ETag is changed.
+    """
+    from .models import get_change_update, get_rating_update, Answer, Question
+
+    cache = get_cache()
+    keys = sorted(keys)
+    updated = 0
+
+    for start in range(0, len(keys), settings.VOTE_BUFFER_BATCH):
+        deltas = {key: delta for key, delta in
+                  cache.get_many(keys[start:start + settings.VOTE_BUFFER_BATCH]).items()
+                  if delta}
+
+        for question_or_answer, object_class in (('q', Question), ('a', Answer)):
+            batch = {int(key.rsplit(':', 1)[1]): (key, delta)
+                     for key, delta in deltas.items()
+                     if key.split(':')[1] == question_or_answer}
+            if not batch:
+                continue
+
+            for key, delta in batch.values():
+                cache.incr(key, -delta)
+
+            try:
+                with transaction.atomic():
+                    object_class.objects.filter(id__in=batch).update(
+                        **get_rating_update(question_or_answer, models.Case(
+                            *[models.When(id=id_, then=models.Value(delta))
+                              for id_, (_, delta) in batch.items()],
+                            default=models.Value(0),
+                            output_field=models.IntegerField())))
+
+                    question_ids = set()
+                    if question_or_answer == 'a':
+                        question_ids = set(Answer.objects.filter(id__in=batch).values_list(
+                            'related_question_id', flat=True))
+                        Question.objects.filter(id__in=question_ids).update(
+                            **get_change_update())
+            except Exception:
+                # Return deltas back to the buffer to not lose votes
+                for key, delta in batch.values():
+                    cache.incr(key, delta)
+                raise
+
+            fragments.bump(*[fragments.question_version(id_) for id_ in question_ids])
+
+            updated += len(batch)
+
+    return updated
+
+
+def flush_forever():
+    """
+    Flush buffer every settings.VOTE_BUFFER_FLUSH_INTERVAL seconds
+    """
+    while True:
+        time.sleep(settings.VOTE_BUFFER_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception('Flush of vote buffer failed')
+        finally:
+            close_old_connections()
+
+
+def start_flusher():
+    """
+    Start flusher thread in current process if it is configured.
+    It is required for caches which are not shared between processes (locmem).
+    """
+    global _flusher
+
+    if settings.VOTE_BUFFER_FLUSH_INTERVAL is None or _flusher is not None:
+        return
+
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=flush_forever, name='vote-buffer-flusher',
+                                        daemon=True)
+            _flusher.start()
@@ -4,7 +4,7 @@ $(document).ready( function() {
 
         var id_qa = '#' + $(this).attr("id").substring(0, $(this).attr("id").length - 3);
 
-        if ( $(this).hasClass("no-auth") ) {
+        if ( $("#is-authenticated").html() != "True" ) {
            $(".alert").hide();
            $(this).parent().parent().prev().prev().show('medium');
            return;
@@ -115,7 +115,7 @@ $(document).ready( function() {
 
     $(function() {
         if ( $( "#date-list" ).length ) {
-            $.get('/paginate_data/', {page: 1, data: 'd'}, function(data){
+            $.get('/paginate_data/', {data: 'd', cursor: ''}, function(data){
              $('#date-list').html(data);
             });
         };
@@ -123,7 +123,7 @@ $(document).ready( function() {
 
      $(function() {
         if ( $( "#trend-list" ).length ) {
-            $.get('/paginate_data/', {page: 1, data: 't'}, function(data){
+            $.get('/paginate_data/', {data: 't', cursor: ''}, function(data){
              $('#trend-list').html(data);
             });
         };